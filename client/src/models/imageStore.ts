@@ -3,6 +3,12 @@ import { create } from 'zustand';
 import { v4 as uuidv4 } from 'uuid';
 import { Image } from './types';
 
+// Screen recordings are split into keyframes by the server, one screenshot per UI state
+export const IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/svg+xml', 'image/gif'];
+export const VIDEO_TYPES = ['video/mp4', 'video/quicktime', 'video/webm', 'video/x-matroska', 'video/x-msvideo'];
+
+export const isVideo = (image: Image) => VIDEO_TYPES.includes(image.file?.type ?? '');
+
 interface ImageState {
   images: Image[];
   currentImage: Image | null;
@@ -20,9 +26,9 @@ export const useImageStore = create<ImageState>((set, get) => ({
   addImage: async (file: File) => {
     return new Promise((resolve, reject) => {
       // Check file type
-      const allowedTypes = ['image/jpeg', 'image/png', 'image/svg+xml', 'image/gif'];
+      const allowedTypes = [...IMAGE_TYPES, ...VIDEO_TYPES];
       if (!allowedTypes.includes(file.type)) {
-        reject(new Error('File type not supported. Please upload SVG, PNG, JPG or GIF.'));
+        reject(new Error('File type not supported. Please upload SVG, PNG, JPG, GIF or a screen recording (MP4, MOV, WebM).'));
         return;
       }
       
@@ -4,6 +4,7 @@ import { useDropzone } from 'react-dropzone';
 import { Upload, X } from 'lucide-react';
 import imageController from '../../controllers/imageController';
 import { Image } from '../../models/types';
+import { IMAGE_TYPES, VIDEO_TYPES, isVideo } from '../../models/imageStore';
 
 interface UploadAreaProps {
   onUploadComplete?: (images: Image[]) => void;
@@ -68,13 +69,13 @@ const UploadArea: React.FC<UploadAreaProps> = ({ onUploadComplete, mode = 'initi
 
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
-    accept: {
-      'image/jpeg': [],
-      'image/png': [],
-      'image/svg+xml': [],
-      'image/gif': []
-    },
-    maxSize: 5 * 1024 * 1024 // 5MB
+    accept: Object.fromEntries([...IMAGE_TYPES, ...VIDEO_TYPES].map(type => [type, []])),
+    maxSize: 100 * 1024 * 1024, // 100MB, for recordings
+    validator: (file) => (
+      IMAGE_TYPES.includes(file.type) && file.size > 5 * 1024 * 1024
+        ? { code: 'file-too-large', message: 'Screenshots must be 5MB or smaller' }
+        : null
+    )
   });
 
   const handleRemoveImage = (id: string) => {
@@ -133,7 +134,7 @@ const UploadArea: React.FC<UploadAreaProps> = ({ onUploadComplete, mode = 'initi
               }
             </p>
             <p className="text-gray-400 text-sm mt-1">
-              SVG, PNG, JPG or GIF (max. 5MB each)
+              SVG, PNG, JPG or GIF (max. 5MB each), or MP4, MOV or WebM recordings (max. 100MB)
             </p>
           </div>
         </div>
@@ -163,11 +164,19 @@ const UploadArea: React.FC<UploadAreaProps> = ({ onUploadComplete, mode = 'initi
             {uploadedImages.map((image) => (
               <div key={image.id} className="relative group">
                 <div className="aspect-w-1 aspect-h-1 w-full overflow-hidden rounded-lg bg-gray-100">
-                  <img 
-                    src={image.url} 
-                    alt={image.name} 
-                    className="object-cover h-full w-full group-hover:opacity-75 transition-opacity"
-                  />
+                  {isVideo(image) ? (
+                    <video 
+                      src={image.url} 
+                      muted 
+                      className="object-cover h-full w-full group-hover:opacity-75 transition-opacity"
+                    />
+                  ) : (
+                    <img 
+                      src={image.url} 
+                      alt={image.name} 
+                      className="object-cover h-full w-full group-hover:opacity-75 transition-opacity"
+                    />
+                  )}
                 </div>
                 <button
                   onClick={(e) => {
@@ -6,6 +6,7 @@ import UploadArea from '../components/UploadArea';
 import navigationController from '../../controllers/navigationController';
 import imageController from '../../controllers/imageController';
 import { Image } from '../../models/types';
+import { isVideo } from '../../models/imageStore';
 
 const PreviewScreen: React.FC = () => {
   const [images, setImages] = useState<Image[]>([]);
@@ -145,11 +146,19 @@ const PreviewScreen: React.FC = () => {
         {images.length > 0 && (
           <>
             <div className="aspect-w-16 aspect-h-9 relative">
-              <img 
-                src={images[currentImageIndex].url} 
-                alt={images[currentImageIndex].name} 
-                className="object-contain w-full h-full"
-              />
+              {isVideo(images[currentImageIndex]) ? (
+                <video 
+                  src={images[currentImageIndex].url} 
+                  controls 
+                  className="object-contain w-full h-full"
+                />
+              ) : (
+                <img 
+                  src={images[currentImageIndex].url} 
+                  alt={images[currentImageIndex].name} 
+                  className="object-contain w-full h-full"
+                />
+              )}
               
               {images.length > 1 && (
                 <div className="absolute inset-0 flex items-center justify-between pointer-events-none">
@@ -188,12 +197,21 @@ const PreviewScreen: React.FC = () => {
                         index === currentImageIndex ? 'border-blue-500 ring-2 ring-blue-300' : 'border-gray-200'
                       }`}
                     >
-                      <img 
-                        src={image.url} 
-                        alt={`Thumbnail ${index + 1}`} 
-                        className="w-full h-full object-cover"
-                        onClick={() => setCurrentImageIndex(index)}
-                      />
+                      {isVideo(image) ? (
+                        <video 
+                          src={image.url} 
+                          muted 
+                          className="w-full h-full object-cover"
+                          onClick={() => setCurrentImageIndex(index)}
+                        />
+                      ) : (
+                        <img 
+                          src={image.url} 
+                          alt={`Thumbnail ${index + 1}`} 
+                          className="w-full h-full object-cover"
+                          onClick={() => setCurrentImageIndex(index)}
+                        />
+                      )}
                       <button
                         onClick={(e) => {
                           e.stopPropagation();
@@ -0,0 +1,168 @@
+# BedrockCassette.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+# off: call Bedrock. record: call Bedrock and save every exchange to the cassette.
+# replay: answer from the cassette only, without AWS credentials or network.
+BEDROCK_CASSETTE_MODE = os.environ.get('BEDROCK_CASSETTE_MODE', 'off').lower()
+BEDROCK_CASSETTE_DIR = os.environ.get('BEDROCK_CASSETTE_DIR', 'cassettes')
+# Replayed calls take their recorded latency times this factor (0 answers at once)
+BEDROCK_REPLAY_LATENCY_SCALE = float(os.environ.get('BEDROCK_REPLAY_LATENCY_SCALE', 1.0))
+
+CASSETTE_MODES = ('off', 'record', 'replay')
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode for a request the cassette has no recording of"""
+
+
+def request_digest(model_id: str, messages: List[Dict[str, Any]], inference_config: Dict[str, Any]) -> str:
+    """Digest of everything that determines a converse response, images included"""
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps({'model_id': model_id, 'inference_config': inference_config}, sort_keys=True).encode())
+    for message in messages:
+        hasher.update(message['role'].encode())
+        for content in message['content']:
+            if 'text' in content:
+                hasher.update(b'text:' + content['text'].encode())
+            elif 'image' in content:
+                hasher.update(f"image/{content['image']['format']}:".encode() + content['image']['source']['bytes'])
+    return hasher.hexdigest()
+
+
+def summarize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The request as stored in a cassette: prompt text in full, images by digest and size only"""
+    summary = []
+    for message in messages:
+        for content in message['content']:
+            if 'text' in content:
+                summary.append({'text': content['text']})
+            elif 'image' in content:
+                image_bytes = content['image']['source']['bytes']
+                summary.append({'image': {
+                    'format': content['image']['format'],
+                    'sha256': hashlib.sha256(image_bytes).hexdigest(),
+                    'bytes': len(image_bytes)
+                }})
+    return summary
+
+
+class BedrockCassette:
+    """
+    Records converse exchanges to disk and replays them.
+
+    Each exchange is one gzipped JSON file named by its request digest, holding
+    the request (prompts, image digests, inference settings), the response text,
+    token usage and the latency observed when it was recorded. Replay returns
+    the recorded response after the recorded latency (scaled), so runs are
+    deterministic and realistic in timing without calling the model.
+    """
+
+    def __init__(self, mode: str = BEDROCK_CASSETTE_MODE, cassette_dir: str = BEDROCK_CASSETTE_DIR,
+                 latency_scale: float = BEDROCK_REPLAY_LATENCY_SCALE):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {', '.join(CASSETTE_MODES)}")
+        self.mode = mode
+        self.cassette_dir = cassette_dir
+        self.latency_scale = latency_scale
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if mode == 'record':
+            os.makedirs(cassette_dir, exist_ok=True)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    def entry_path(self, digest: str) -> str:
+        return os.path.join(self.cassette_dir, f"{digest}.json.gz")
+
+    def converse(self, model_id: str, messages: List[Dict[str, Any]], inference_config: Dict[str, Any],
+                 call: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Run a converse call through the cassette; `call` makes the live request"""
+        if self.mode == 'off':
+            return call()
+        digest = request_digest(model_id, messages, inference_config)
+        if self.mode == 'replay':
+            return self.replay(digest)
+        started = time.monotonic()
+        response = call()
+        self.record(digest, model_id, messages, inference_config, response, (time.monotonic() - started) * 1000)
+        return response
+
+    def record(self, digest: str, model_id: str, messages: List[Dict[str, Any]], inference_config: Dict[str, Any],
+               response: Dict[str, Any], elapsed_ms: float) -> None:
+        entry = {
+            'digest': digest,
+            'model_id': model_id,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'request': {'messages': summarize_messages(messages), 'inference_config': inference_config},
+            # The parts of the converse response the client reads
+            'response': {
+                'output': response.get('output', {}),
+                'stopReason': response.get('stopReason'),
+                'usage': response.get('usage', {}),
+                'metrics': response.get('metrics', {})
+            },
+            # Wall-clock time of the call as seen by this process, network included
+            'elapsed_ms': round(elapsed_ms)
+        }
+        path = self.entry_path(digest)
+        # Write then rename so a replaying process never reads a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing cassette entry {digest}: {str(e)}")
+            return
+        with self._lock:
+            self.recorded += 1
+
+    def replay(self, digest: str) -> Dict[str, Any]:
+        path = self.entry_path(digest)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            raise CassetteMiss(f"No recording of request {digest} in {self.cassette_dir}")
+        if self.latency_scale > 0:
+            time.sleep(entry.get('elapsed_ms', 0) * self.latency_scale / 1000)
+        with self._lock:
+            self.replayed += 1
+        return entry['response']
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'cassette_dir': self.cassette_dir,
+                'latency_scale': self.latency_scale if self.replaying else None,
+                'recorded': self.recorded,
+                'replayed': self.replayed,
+                'misses': self.misses
+            }
+
+
+_cassette: Optional[BedrockCassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> BedrockCassette:
+    """Return the process-wide cassette shared by every Bedrock client"""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = BedrockCassette()
+        return _cassette
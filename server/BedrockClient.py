@@ -1,25 +1,136 @@
-
 import boto3
-import base64
 import io
-import json
+import threading
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from PIL import Image
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import os
+from TokenScheduler import RequestBudget, BudgetExceeded, get_scheduler, BATCH
+from BedrockCassette import get_cassette, CassetteMiss
 
 
 LLM_MODELS = {
     "LLAMA-3": "us.meta.llama3-2-3b-[xyz]",
+    "CLAUDE-3-HAIKU": "anthropic.claude-3-haiku-[xyz]-v[x]:0",
     "CLAUDE-3.5": "anthropic.claude-3-5-sonnet-[xyz]-v[x]:0",
     "CLAUDE-3.7": "anthropic.claude-3-7-sonnet-[xyz]-v[x]:0"
 }
 
+# USD per 1,000 tokens (input, output) of each model in LLM_MODELS, used to report spend
+LLM_MODEL_PRICING = {
+    "LLAMA-3": (0.00015, 0.00015),
+    "CLAUDE-3-HAIKU": (0.00025, 0.00125),
+    "CLAUDE-3.5": (0.003, 0.015),
+    "CLAUDE-3.7": (0.003, 0.015)
+}
+MODEL_PRICING = {LLM_MODELS[name]: price for name, price in LLM_MODEL_PRICING.items()}
+_unpriced_models = set()
+
 IMAGE_DIMENSION_LIMIT = 1024
+# Rough prompt-text density used to estimate input tokens before a call
+CHARS_PER_TOKEN = 4
+
+# Fast model used to pre-screen screenshots when the pipeline runs in cascade mode.
+# Triage sends the screenshot, so this must be a vision model.
+TRIAGE_MODEL_ID = os.environ.get('TRIAGE_MODEL_ID', LLM_MODELS["CLAUDE-3-HAIKU"])
+
+# Connection settings for the shared bedrock-runtime clients. botocore defaults to
+# 10 pooled connections and legacy retries, which throttles concurrent analyses.
+BEDROCK_REGION = os.environ.get('BEDROCK_REGION') or None
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get('BEDROCK_MAX_POOL_CONNECTIONS', 50))
+BEDROCK_CONNECT_TIMEOUT = int(os.environ.get('BEDROCK_CONNECT_TIMEOUT', 10))
+BEDROCK_READ_TIMEOUT = int(os.environ.get('BEDROCK_READ_TIMEOUT', 300))
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_MAX_ATTEMPTS', 4))
+
+_runtime_clients: Dict[Optional[str], Any] = {}
+_bedrock_clients: Dict[Tuple[str, Optional[str]], "BedrockClient"] = {}
+_registry_lock = threading.Lock()
+
+
+def get_bedrock_runtime(region: Optional[str] = None) -> Any:
+    """Return the process-wide bedrock-runtime client for a region, creating it once."""
+    region = region or BEDROCK_REGION
+    with _registry_lock:
+        runtime = _runtime_clients.get(region)
+        if runtime is None:
+            config = Config(
+                max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+                connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+                read_timeout=BEDROCK_READ_TIMEOUT,
+                tcp_keepalive=True,
+                retries={'max_attempts': BEDROCK_MAX_ATTEMPTS, 'mode': 'adaptive'}
+            )
+            runtime = boto3.client('bedrock-runtime', region_name=region, config=config)
+            _runtime_clients[region] = runtime
+        return runtime
+
+
+def estimate_cost(model_id: str, input_tokens: int, output_tokens: int) -> float:
+    """USD cost of a call, 0 (with a warning, once per model) for models without pricing"""
+    price = MODEL_PRICING.get(model_id)
+    if price is None:
+        with _registry_lock:
+            unseen = model_id not in _unpriced_models
+            _unpriced_models.add(model_id)
+        if unseen:
+            print(f"No pricing for model {model_id}; its spend is reported as $0. Add it to LLM_MODEL_PRICING.")
+        return 0.0
+    return (input_tokens * price[0] + output_tokens * price[1]) / 1000
+
+
+def get_bedrock_client(model_id: str = LLM_MODELS["CLAUDE-3.5"], region: Optional[str] = None) -> "BedrockClient":
+    """Return the shared BedrockClient for a model/region pair."""
+    key = (model_id, region or BEDROCK_REGION)
+    with _registry_lock:
+        client = _bedrock_clients.get(key)
+    if client is None:
+        client = BedrockClient(model_id, region)
+        with _registry_lock:
+            client = _bedrock_clients.setdefault(key, client)
+    return client
+
+
+def preconnect_bedrock_runtime(runtime: Any, model_id: str) -> bool:
+    """
+    Open a pooled TLS connection to the bedrock-runtime endpoint with a request
+    that costs no tokens. An empty invoke_model body is rejected before any
+    inference runs; that answer, like an access error, means the connection was
+    established and is reused by the next converse call.
+    """
+    try:
+        runtime.invoke_model(modelId=model_id, body=b'{}')
+    except ClientError:
+        pass
+    except BotoCoreError as e:
+        # No connection (network or credentials)
+        print(f"Bedrock pre-connect failed: {e}")
+        return False
+    return True
+
+
+def warm_up_bedrock_clients(model_ids: Optional[List[str]] = None, region: Optional[str] = None) -> None:
+    """Build the shared clients and connect to Bedrock before the first request arrives."""
+    model_ids = model_ids or [LLM_MODELS["CLAUDE-3.5"]]
+    for model_id in model_ids:
+        get_bedrock_client(model_id, region)
+    if get_cassette().replaying:
+        print("Bedrock calls are replayed from the cassette")
+        return
+    # Client construction loads the service model and resolves credentials, and the
+    # pre-connect call pays for the TLS handshake, so the first converse call only
+    # pays for the request itself
+    runtime = get_bedrock_runtime(region)
+    if preconnect_bedrock_runtime(runtime, model_ids[0]):
+        print(f"Bedrock clients ready in region {runtime.meta.region_name}")
+
 
 class BedrockClient:
-    def __init__(self, model_id: str = LLM_MODELS["CLAUDE-3.5"]):
+    def __init__(self, model_id: str = LLM_MODELS["CLAUDE-3.5"], region: Optional[str] = None):
         self.MODEL_ID = model_id
-        self.bedrock = boto3.client('bedrock-runtime')
+        self.cassette = get_cassette()
+        # Replay runs offline, without a region or credentials
+        self.bedrock = None if self.cassette.replaying else get_bedrock_runtime(region)
         self.IMAGES_PATH = "images/"
     
     def normalize_path(self, path: str) -> str:
@@ -49,22 +160,29 @@ class BedrockClient:
         except Exception as e:
             raise Exception(f"Error encoding image {image_path}: {str(e)}")
 
-    def prepare_message(self, prompt: str, image_paths: List[str]) -> Dict[str, Any]:
+    def read_prepared_image(self, image_path: str) -> bytes:
+        with open(image_path, 'rb') as image_file:
+            return image_file.read()
+
+    def prepare_message(self, prompt: str, image_paths: List[str], prepared: bool = False) -> Dict[str, Any]:
         messages = []
         for image_path in image_paths:
             try:
-                encoded_image = self.encode_image(image_path)
-                messages.append({
-                        "role": "user",
-                        "content": [{
-                            "image": {
-                                "format": "png",
-                                "source": {
-                                    "bytes":encoded_image
-                                }
-                            }
-                        }]
-                    })
+                # Prepared images already went through the image-budget stage as PNGs
+                encoded_image = self.read_prepared_image(image_path) if prepared else self.encode_image(image_path)
+                image = {
+                    "image": {
+                        "format": "png",
+                        "source": {
+                            "bytes":encoded_image
+                        }
+                    }
+                }
+                # Several images share one user turn; Bedrock rejects consecutive user messages
+                if messages:
+                    messages[-1]["content"].append(image)
+                else:
+                    messages.append({"role": "user", "content": [image]})
             except Exception as e:
                 raise Exception(f"Error processing image {image_path}: {str(e)}")
         
@@ -76,30 +194,61 @@ class BedrockClient:
             messages.append({"role": "user", "content": [{ "text": prompt }]})
         return messages
 
-    def call_claude(self, prompt: str, image_paths: List[str]) -> Dict[str, Any]:
+    def estimate_input_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        # Imported here because the image-budget stage itself imports this module
+        from image_budget import estimate_image_tokens
+        tokens = 0
+        for message in messages:
+            for content in message["content"]:
+                if "text" in content:
+                    tokens += len(content["text"]) // CHARS_PER_TOKEN
+                elif "image" in content:
+                    # Only the PNG header is read to get the size
+                    with Image.open(io.BytesIO(content["image"]["source"]["bytes"])) as image:
+                        tokens += estimate_image_tokens(*image.size)
+        return tokens
+
+    def call_claude(self, prompt: str, image_paths: List[str], max_tokens: int = 8192, prepared: bool = False,
+                    budget: Optional[RequestBudget] = None) -> Dict[str, Any]:
         try:
-            messages = self.prepare_message(prompt, image_paths)
-            
-            response = self.bedrock.converse(
-                modelId=self.MODEL_ID,
-                messages=messages,
-                inferenceConfig={
-                    "maxTokens": 8192,
-                    "temperature": 0.7,
-                    "topP": 0.9
-                }
-            )
+            messages = self.prepare_message(prompt, image_paths, prepared)
+
+            # Calls without a request budget (e.g. background warm-up) queue behind
+            # interactive work and are not limited
+            budget = budget or RequestBudget(tenant=None, priority=BATCH, token_limit=None)
+            scheduler = get_scheduler()
+            inference_config = {
+                "maxTokens": max_tokens,
+                "temperature": 0.7,
+                "topP": 0.9
+            }
+            # The whole output limit is reserved until the reported tokens are charged
+            with scheduler.admit(budget, self.estimate_input_tokens(messages), max_tokens):
+                # Recorded or replayed when a cassette mode is set; replayed calls still
+                # queue and are charged like live ones
+                response = self.cassette.converse(
+                    self.MODEL_ID, messages, inference_config,
+                    lambda: self.bedrock.converse(modelId=self.MODEL_ID, messages=messages,
+                                                  inferenceConfig=inference_config)
+                )
+                input_tokens = response.get('usage', {}).get('inputTokens') or 0
+                output_tokens = response.get('usage', {}).get('outputTokens') or 0
+                scheduler.charge(budget, input_tokens, output_tokens,
+                                 estimate_cost(self.MODEL_ID, input_tokens, output_tokens))
             
             response_text = response.get("output", {}).get("message", {}).get("content", [{}])[0].get("text", "")
             
             return {
                 'response': response_text,
                 'metadata': {
-                    'input_tokens': response.get('usage', {}).get('inputTokens', {}),
-                    'output_tokens': response.get('usage', {}).get('outputTokens', {}),
-                    'latency': response.get('metrics', {}).get('latencyMs', {})
+                    'input_tokens': input_tokens,
+                    'output_tokens': output_tokens,
+                    'latency': response.get('metrics', {}).get('latencyMs', {}),
+                    'model_id': self.MODEL_ID
                 }
             }
             
+        except (BudgetExceeded, CassetteMiss):
+            raise
         except Exception as e:
             raise Exception(f"Error calling Claude: {str(e)}")
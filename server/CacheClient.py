@@ -1,7 +1,19 @@
 import os
 import json
 import hashlib
-from typing import Optional, Dict, Any
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Callable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing falls back to in-process only
+    fcntl = None
+
+# In-flight computations per cache entry, shared by every CacheClient in the process.
+# Each entry is [lock, number of callers holding or waiting on it].
+_inflight: Dict[str, list] = {}
+_inflight_guard = threading.Lock()
 
 class CacheClient:
     def __init__(self, cache_dir: str = './cache'):
@@ -14,7 +26,10 @@ class CacheClient:
             cache_file = os.path.join(cache_dir, f"{cache_key}.json")
             if os.path.exists(cache_file):
                 with open(cache_file, 'r') as f:
-                    return json.load(f)
+                    data = json.load(f)
+                # Storage eviction goes by modification time, so a hit keeps the entry fresh
+                os.utime(cache_file)
+                return data
         except Exception as e:
             print(f"Error reading cache: {str(e)}")
         return None
@@ -24,15 +39,85 @@ class CacheClient:
             cache_dir = os.path.join(self.cache_dir, subfolder)
             os.makedirs(cache_dir, exist_ok=True)
             cache_file = os.path.join(cache_dir, f"{cache_key}.json")
-            with open(cache_file, 'w') as f:
+            # Write then rename so readers in other processes never see a partial file
+            tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_file, 'w') as f:
                 json.dump(data, f, indent=2)
+            os.replace(tmp_file, cache_file)
         except Exception as e:
             print(f"Error writing cache: {str(e)}")
 
+    def delete_cached_data(self, cache_key: str, subfolder: str = '') -> None:
+        try:
+            cache_file = os.path.join(self.cache_dir, subfolder, f"{cache_key}.json")
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+        except Exception as e:
+            print(f"Error deleting cache: {str(e)}")
+
+    @contextmanager
+    def lock(self, cache_key: str, subfolder: str = '') -> Iterator[None]:
+        """Hold the per-entry lock across threads and, through a lock file, across processes"""
+        name = os.path.join(os.path.abspath(self.cache_dir), subfolder, cache_key)
+        with _inflight_guard:
+            entry = _inflight.setdefault(name, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if fcntl is None:
+                    yield
+                    return
+                lock_dir = os.path.join(self.cache_dir, 'locks', subfolder)
+                os.makedirs(lock_dir, exist_ok=True)
+                lock_path = os.path.join(lock_dir, f"{cache_key}.lock")
+                lock_file = self._lock_file(lock_path)
+                try:
+                    yield
+                finally:
+                    # Removed while still held: a process waiting on this file finds
+                    # it unlinked once it gets the lock and locks a fresh one instead
+                    try:
+                        os.remove(lock_path)
+                    except OSError:
+                        pass
+                    lock_file.close()
+        finally:
+            with _inflight_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del _inflight[name]
+
+    @staticmethod
+    def _lock_file(lock_path: str):
+        """Open and flock the lock file, retrying if its holder removed it meanwhile"""
+        while True:
+            lock_file = open(lock_path, 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+    def get_or_compute(self, cache_key: str, compute: Callable[[], Any], subfolder: str = '') -> Any:
+        """Return the cached value, or compute it once while concurrent callers for the same key wait"""
+        cached = self.get_cached_data(cache_key, subfolder)
+        if cached:
+            return cached
+        with self.lock(cache_key, subfolder):
+            # Another caller may have finished the computation while we waited
+            cached = self.get_cached_data(cache_key, subfolder)
+            if cached:
+                return cached
+            data = compute()
+            self.set_cached_data(cache_key, data, subfolder)
+            return data
+
 def create_hash(*args: Any) -> str:
     string_args = [json.dumps(arg, sort_keys=True) if isinstance(arg, (dict, list)) else str(arg) 
                   for arg in args]
     combined = ''.join(string_args)
     
     # Create hash
-    return hashlib.md5(combined.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.md5(combined.encode()).hexdigest()
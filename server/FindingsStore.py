@@ -0,0 +1,183 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterator, Tuple
+
+# Tenant of findings stored before tenants were recorded, and of single-tenant servers
+DEFAULT_TENANT = 'default'
+
+# Columns callers may filter findings on, mapped to their SQL expression
+FILTER_COLUMNS = {
+    'session_id': 'f.session_id',
+    'persona': 'f.persona',
+    'screenshot_digest': 'f.screenshot_digest',
+    'rule_id': 'f.rule_id',
+    'severity': 'f.severity',
+    'category': 'c.category'
+}
+# Columns findings may be aggregated by
+GROUP_COLUMNS = dict(FILTER_COLUMNS, screenshot_name='f.screenshot_name')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tenant TEXT NOT NULL DEFAULT 'default',
+    session_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    persona TEXT NOT NULL,
+    screenshot_digest TEXT NOT NULL,
+    screenshot_name TEXT,
+    rule_id TEXT,
+    severity TEXT,
+    categories TEXT,
+    description TEXT,
+    location TEXT,
+    recommendation TEXT
+);
+CREATE TABLE IF NOT EXISTS finding_categories (
+    finding_id INTEGER NOT NULL REFERENCES findings(id) ON DELETE CASCADE,
+    category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_findings_session ON findings(session_id);
+CREATE INDEX IF NOT EXISTS idx_findings_tenant ON findings(tenant, created_at);
+CREATE INDEX IF NOT EXISTS idx_findings_created ON findings(created_at);
+CREATE INDEX IF NOT EXISTS idx_findings_digest ON findings(screenshot_digest);
+CREATE INDEX IF NOT EXISTS idx_findings_persona_rule ON findings(persona, rule_id, severity);
+CREATE INDEX IF NOT EXISTS idx_findings_rule_severity ON findings(rule_id, severity);
+CREATE INDEX IF NOT EXISTS idx_findings_severity ON findings(severity, created_at);
+CREATE INDEX IF NOT EXISTS idx_categories_category ON finding_categories(category, finding_id);
+CREATE INDEX IF NOT EXISTS idx_categories_finding ON finding_categories(finding_id);
+"""
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def split_categories(categories: Any) -> List[str]:
+    """Bug categories come back as a list or a ';'/','-separated string"""
+    if isinstance(categories, list):
+        parts = categories
+    else:
+        parts = re.split(r'[;,]', str(categories or ''))
+    return [part.strip() for part in parts if str(part).strip()]
+
+class FindingsStore:
+    def __init__(self, db_path: str = 'findings.db'):
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            columns = [row['name'] for row in conn.execute("PRAGMA table_info(findings)")]
+            if columns and 'tenant' not in columns:
+                # Databases created before findings were scoped by tenant
+                conn.execute(f"ALTER TABLE findings ADD COLUMN tenant TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA foreign_keys=ON')
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_analysis(self, session_id: str, persona: str, screenshot_digest: str, analysis: Dict[str, Any],
+                     tenant: str = DEFAULT_TENANT) -> int:
+        """Index every bug of one screenshot analysis; returns the number of findings stored"""
+        created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        screenshot_name = os.path.basename(analysis.get('screenshot_path') or analysis.get('screenshot', ''))
+        count = 0
+        with self._write_lock, self._connect() as conn:
+            for violation in analysis.get('violations', []):
+                for bug in violation.get('bugs', []):
+                    cursor = conn.execute(
+                        """INSERT INTO findings (tenant, session_id, created_at, persona, screenshot_digest, screenshot_name,
+                                                 rule_id, severity, categories, description, location, recommendation)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (tenant, session_id, created_at, persona.upper(), screenshot_digest, screenshot_name,
+                         violation.get('rule_id'), str(bug.get('severity', '')).capitalize(),
+                         '; '.join(split_categories(bug.get('categories'))), bug.get('description'),
+                         bug.get('location'), bug.get('recommendation'))
+                    )
+                    conn.executemany(
+                        "INSERT INTO finding_categories (finding_id, category) VALUES (?, ?)",
+                        [(cursor.lastrowid, category) for category in split_categories(bug.get('categories'))]
+                    )
+                    count += 1
+        return count
+
+    def _where(self, tenant: str, filters: Dict[str, Any]) -> Tuple[str, str, list]:
+        # Every query is confined to one tenant; the caller's filters only narrow it
+        clauses, params = ['f.tenant = ?'], [tenant]
+        for name, value in filters.items():
+            if value in (None, ''):
+                continue
+            if name == 'since':
+                clauses.append('f.created_at >= ?')
+            elif name == 'until':
+                clauses.append('f.created_at < ?')
+            elif name in FILTER_COLUMNS:
+                clauses.append(f'{FILTER_COLUMNS[name]} = ?')
+                if name == 'persona':
+                    value = str(value).upper()
+                elif name == 'severity':
+                    value = str(value).capitalize()
+            else:
+                raise ValueError(f"Unknown filter: {name}")
+            params.append(value)
+        # Only join categories when needed; one finding can have several
+        join = 'JOIN finding_categories c ON c.finding_id = f.id' if filters.get('category') else ''
+        where = f"WHERE {' AND '.join(clauses)}"
+        return join, where, params
+
+    def query(self, tenant: str, page: int = 1, page_size: int = 50, **filters: Any) -> Dict[str, Any]:
+        """One tenant's filtered findings, newest first, one page at a time"""
+        page, page_size = max(1, page), min(max(1, page_size), 500)
+        join, where, params = self._where(tenant, filters)
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(DISTINCT f.id) FROM findings f {join} {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"""SELECT DISTINCT f.* FROM findings f {join} {where}
+                    ORDER BY f.created_at DESC, f.id DESC LIMIT ? OFFSET ?""",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        return {
+            'findings': [dict(row) for row in rows],
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'pages': (total + page_size - 1) // page_size
+        }
+
+    def aggregate(self, tenant: str, group_by: str, **filters: Any) -> Dict[str, Any]:
+        """Count one tenant's findings per value of group_by (rule_id, severity, category, ...)"""
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Cannot group by: {group_by}")
+        join, where, params = self._where(tenant, filters)
+        if group_by == 'category' and not join:
+            join = 'JOIN finding_categories c ON c.finding_id = f.id'
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""SELECT {GROUP_COLUMNS[group_by]} AS value, COUNT(DISTINCT f.id) AS count
+                    FROM findings f {join} {where}
+                    GROUP BY value ORDER BY count DESC""",
+                params
+            ).fetchall()
+        return {
+            'group_by': group_by,
+            'groups': [dict(row) for row in rows],
+            'total': sum(row['count'] for row in rows)
+        }
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Optional, Dict, Any, Iterator
+from StorageManager import acquire_paths, release_paths
+
+# Where per-request result spools are written while an analysis runs
+SPOOL_DIR = os.environ.get('SPOOL_DIR', os.path.join('cache', 'spool'))
+
+class ResultSpool:
+    """
+    Append-only, on-disk list of analysis results.
+
+    Each result is written as one JSON line as soon as it completes; only its
+    file offset is kept in memory. Iterating reads the results back one at a
+    time in index order, so holding a spool costs memory per result offset,
+    not per result.
+    """
+
+    def __init__(self, spool_dir: str = SPOOL_DIR):
+        os.makedirs(spool_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl', dir=spool_dir)
+        # Keep the storage sweep away from the spool while it is open
+        acquire_paths([self.path])
+        self._file = os.fdopen(fd, 'w+', encoding='utf-8')
+        self._offsets: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def append(self, result: Dict[str, Any], index: Optional[int] = None) -> None:
+        """Write a result; index orders results that complete out of order"""
+        line = json.dumps(result) + '\n'
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(line)
+            self._file.flush()
+            self._offsets[len(self._offsets) if index is None else index] = offset
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in sorted(self._offsets):
+            with self._lock:
+                self._file.seek(self._offsets[index])
+                line = self._file.readline()
+            yield json.loads(line)
+
+    def close(self) -> None:
+        """Close and delete the spool file"""
+        try:
+            self._file.close()
+            os.remove(self.path)
+        except OSError as e:
+            print(f"Error removing result spool {self.path}: {str(e)}")
+        finally:
+            release_paths([self.path])
+
+    def __enter__(self) -> 'ResultSpool':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
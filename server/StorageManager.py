@@ -0,0 +1,272 @@
+# StorageManager.py
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: held cache locks cannot be detected
+    fcntl = None
+
+MB = 1024 * 1024
+HOUR = 3600
+
+# How often the background sweep runs, in seconds
+STORAGE_SWEEP_INTERVAL = float(os.environ.get('STORAGE_SWEEP_INTERVAL', 300))
+# Files modified more recently than this are never evicted, so uploads waiting for
+# their /api/analyze call and images being sent to the model stay in place
+STORAGE_GRACE_PERIOD = float(os.environ.get('STORAGE_GRACE_PERIOD', 900))
+
+# Leases on files and directories in use by a run, shared by every component of
+# the process. Each entry is the number of holders.
+_leases: Dict[str, int] = {}
+_leases_guard = threading.Lock()
+
+
+def acquire_paths(paths: Iterable[str]) -> None:
+    """Protect files (or whole directories) from eviction until released"""
+    with _leases_guard:
+        for path in paths:
+            path = os.path.abspath(path)
+            _leases[path] = _leases.get(path, 0) + 1
+
+
+def release_paths(paths: Iterable[str]) -> None:
+    with _leases_guard:
+        for path in paths:
+            path = os.path.abspath(path)
+            if path in _leases:
+                _leases[path] -= 1
+                if _leases[path] <= 0:
+                    del _leases[path]
+
+
+@contextmanager
+def lease_paths(paths: Iterable[str]) -> Iterator[None]:
+    paths = list(paths)
+    acquire_paths(paths)
+    try:
+        yield
+    finally:
+        release_paths(paths)
+
+
+def is_leased(path: str) -> bool:
+    """Whether the path, or a directory containing it, is leased"""
+    path = os.path.abspath(path)
+    with _leases_guard:
+        while True:
+            if path in _leases:
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+
+
+def _lock_held(path: str) -> bool:
+    """Whether another caller holds the flock on a cache lock file"""
+    if fcntl is None or not path.endswith('.lock'):
+        return False
+    try:
+        with open(path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return False
+    except OSError:
+        return True
+
+
+def _env_number(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+class StorageArea:
+    """
+    One directory tree with its own limits.
+
+    quota_bytes caps the area's total size (0 for no cap) and max_age the age in
+    seconds of its files (0 for no limit). Subdirectories named in exclude belong
+    to other areas or must never be evicted.
+    """
+
+    def __init__(self, name: str, path: str, quota_mb: float, max_age_hours: float, exclude: Tuple[str, ...] = ()):
+        prefix = name.upper()
+        self.name = name
+        self.path = path
+        self.quota_bytes = int(_env_number(f'{prefix}_QUOTA_MB', quota_mb) * MB)
+        self.max_age = _env_number(f'{prefix}_MAX_AGE_HOURS', max_age_hours) * HOUR
+        self.exclude = exclude
+
+    def files(self) -> List[Tuple[str, int, float]]:
+        """(path, size, mtime) of every file in the area"""
+        entries = []
+        for root, dirs, names in os.walk(self.path):
+            if root == self.path:
+                dirs[:] = [directory for directory in dirs if directory not in self.exclude]
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Removed while we walked
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+
+DEFAULT_AREAS = [
+    StorageArea('uploads', os.path.join('images', 'screenshots'), 1024, 24, exclude=('resized',)),
+    StorageArea('resized', os.path.join('images', 'screenshots', 'resized'), 1024, 6),
+    StorageArea('reports', 'reports', 2048, 7 * 24),
+    # Rules analyses are a few small files the warm-up expects to stay cached
+    StorageArea('cache', 'cache', 2048, 30 * 24, exclude=('locks', 'spool', 'rules_analysis')),
+    StorageArea('locks', os.path.join('cache', 'locks'), 0, 24),
+    StorageArea('spool', os.path.join('cache', 'spool'), 4096, 24),
+]
+
+
+class StorageManager:
+    """
+    Keeps each storage area within its quota and maximum file age.
+
+    A background thread sweeps every area periodically: files older than the
+    area's max age are removed, then the oldest files are removed until the area
+    fits its quota. Files that are leased by a running analysis, cache lock files
+    another process holds, and anything modified within the grace period are
+    never removed, so a request that is still running keeps its inputs.
+    """
+
+    def __init__(self, areas: Optional[List[StorageArea]] = None, interval: float = STORAGE_SWEEP_INTERVAL,
+                 grace_period: float = STORAGE_GRACE_PERIOD):
+        self.areas = areas or DEFAULT_AREAS
+        self.interval = interval
+        self.grace_period = grace_period
+        self.last_sweep: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def evictable(self, path: str, mtime: float, now: float) -> bool:
+        return now - mtime > self.grace_period and not is_leased(path) and not _lock_held(path)
+
+    def sweep_area(self, area: StorageArea) -> Dict[str, Any]:
+        """Apply an area's age and size limits; returns what was evicted"""
+        now = time.time()
+        files = area.files()
+        total = sum(size for _, size, _ in files)
+        evicted_files, evicted_bytes = 0, 0
+        # Oldest first, so size eviction removes the least recently written files
+        for path, size, mtime in sorted(files, key=lambda entry: entry[2]):
+            expired = area.max_age and now - mtime > area.max_age
+            over_quota = area.quota_bytes and total > area.quota_bytes
+            if not (expired or over_quota):
+                continue
+            if not self.evictable(path, mtime, now):
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error evicting {path}: {str(e)}")
+                continue
+            total -= size
+            evicted_files += 1
+            evicted_bytes += size
+        self._prune_empty_dirs(area)
+        return {
+            'evicted_files': evicted_files,
+            'evicted_bytes': evicted_bytes,
+            'swept_at': datetime.now().isoformat(timespec='seconds')
+        }
+
+    def sweep(self) -> None:
+        """Sweep every area once"""
+        for area in self.areas:
+            if not os.path.isdir(area.path):
+                continue
+            result = self.sweep_area(area)
+            if result['evicted_files']:
+                print(f"Storage: evicted {result['evicted_files']} files "
+                      f"({result['evicted_bytes'] / MB:.1f} MB) from {area.name}")
+            with self._lock:
+                self.last_sweep[area.name] = result
+
+    def discard(self, paths: Iterable[str]) -> None:
+        """
+        Release a finished run's leases and delete its input files. Files another
+        running analysis still leases are left for that run (or the sweep) to remove.
+        """
+        paths = list(paths)
+        release_paths(paths)
+        for path in paths:
+            if is_leased(path):
+                continue
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"Error deleting {path}: {str(e)}")
+
+    def usage(self) -> Dict[str, Any]:
+        """Disk usage per area against its limits, and free space on the volume"""
+        areas = {}
+        for area in self.areas:
+            files = area.files() if os.path.isdir(area.path) else []
+            with self._lock:
+                last_sweep = self.last_sweep.get(area.name)
+            areas[area.name] = {
+                'path': area.path,
+                'files': len(files),
+                'bytes': sum(size for _, size, _ in files),
+                'quota_bytes': area.quota_bytes or None,
+                'max_age_hours': area.max_age / HOUR if area.max_age else None,
+                'last_sweep': last_sweep
+            }
+        disk = shutil.disk_usage('.')
+        return {
+            'areas': areas,
+            'disk': {'total_bytes': disk.total, 'used_bytes': disk.used, 'free_bytes': disk.free}
+        }
+
+    def start(self) -> None:
+        """Start the background sweep thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='storage-manager', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Storage sweep error: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def _prune_empty_dirs(self, area: StorageArea) -> None:
+        """Remove empty nested directories of an area, such as a recording's keyframes"""
+        now = time.time()
+        root = area.path
+        excluded = tuple(os.path.join(root, directory) for directory in area.exclude)
+        for directory, _, _ in os.walk(root, topdown=False):
+            # Top-level directories (cache subfolders, resized/, keyframes/) are fixed
+            # locations that writers create once and then expect to exist
+            if directory == root or os.path.dirname(directory) == root or is_leased(directory):
+                continue
+            if directory.startswith(excluded):
+                continue
+            try:
+                if now - os.path.getmtime(directory) <= self.grace_period:
+                    continue
+                os.rmdir(directory)
+            except OSError:
+                pass  # Not empty
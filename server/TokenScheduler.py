@@ -0,0 +1,207 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator
+
+# Scheduling classes: lower values are admitted first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITIES = {'interactive': INTERACTIVE, 'batch': BATCH}
+
+# Model calls in flight at once across the process. Kept below the Bedrock connection
+# pool and executor sizes so waiting happens here, in priority order, rather than FIFO.
+BEDROCK_CONCURRENCY = int(os.environ.get('BEDROCK_CONCURRENCY', 16))
+# Tokens (input + output) one analysis request may spend; 0 disables the limit
+REQUEST_TOKEN_BUDGET = int(os.environ.get('REQUEST_TOKEN_BUDGET', 2_000_000))
+# Tokens one tenant may spend per TENANT_BUDGET_WINDOW seconds; 0 disables the limit
+TENANT_TOKEN_BUDGET = int(os.environ.get('TENANT_TOKEN_BUDGET', 10_000_000))
+TENANT_BUDGET_WINDOW = int(os.environ.get('TENANT_BUDGET_WINDOW', 3600))
+
+class BudgetExceeded(Exception):
+    """Raised instead of making a model call that would overrun a token budget"""
+
+
+class RequestBudget:
+    """
+    Token allowance and spend of one analysis request.
+
+    Estimated input tokens plus the call's output token limit are reserved
+    before each model call and replaced by the reported input/output tokens
+    when it returns. tenant=None keeps the
+    request out of the per-tenant accounting (e.g. background warm-up).
+    """
+
+    def __init__(self, tenant: Optional[str] = 'default', priority: int = INTERACTIVE,
+                 token_limit: Optional[int] = REQUEST_TOKEN_BUDGET):
+        self.tenant = tenant
+        self.priority = priority
+        self.token_limit = token_limit
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.estimated_input_tokens = 0
+        self.reserved_tokens = 0
+        self.cost = 0.0
+        self.calls = 0
+        self.rejected_calls = 0
+        self.queue_wait_ms = 0
+
+    @property
+    def committed_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens + self.reserved_tokens
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'tenant': self.tenant,
+            'priority': next((name for name, value in PRIORITIES.items() if value == self.priority), self.priority),
+            'token_limit': self.token_limit or None,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'estimated_input_tokens': self.estimated_input_tokens,
+            'calls': self.calls,
+            'rejected_calls': self.rejected_calls,
+            'queue_wait_ms': round(self.queue_wait_ms),
+            'cost_usd': round(self.cost, 4)
+        }
+
+
+class TokenScheduler:
+    """
+    Admits model calls in priority order and enforces request and tenant budgets.
+
+    At most `concurrency` calls run at once; callers beyond that wait in a queue
+    ordered by priority (interactive before batch), then arrival. A call whose
+    estimated input tokens plus output token limit would overrun its request's
+    or tenant's remaining budget raises BudgetExceeded instead of running.
+    Reserving the whole output limit keeps concurrent calls from overrunning a
+    budget between admission and their reported spend.
+    """
+
+    def __init__(self, concurrency: int = BEDROCK_CONCURRENCY, tenant_token_limit: int = TENANT_TOKEN_BUDGET,
+                 tenant_window: int = TENANT_BUDGET_WINDOW):
+        self.concurrency = max(1, concurrency)
+        self.tenant_token_limit = tenant_token_limit
+        self.tenant_window = tenant_window
+        self._condition = threading.Condition()
+        self._waiting: list = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._tenant_spend: Dict[str, deque] = {}
+        self._tenant_reserved: Dict[str, int] = {}
+
+    def _tenant_tokens(self, tenant: str) -> int:
+        """Tokens the tenant spent within the window; caller holds the condition"""
+        spend = self._tenant_spend.get(tenant)
+        if not spend:
+            return 0
+        cutoff = time.time() - self.tenant_window
+        while spend and spend[0][0] < cutoff:
+            spend.popleft()
+        return sum(entry[1] for entry in spend)
+
+    def _check(self, budget: RequestBudget, estimate: int) -> None:
+        if budget.token_limit and budget.committed_tokens + estimate > budget.token_limit:
+            raise BudgetExceeded(
+                f"Request token budget of {budget.token_limit} exhausted ({budget.committed_tokens} tokens committed)")
+        if budget.tenant is not None and self.tenant_token_limit:
+            committed = self._tenant_tokens(budget.tenant) + self._tenant_reserved.get(budget.tenant, 0)
+            if committed + estimate > self.tenant_token_limit:
+                raise BudgetExceeded(
+                    f"Token budget of {self.tenant_token_limit} per {self.tenant_window}s exhausted for tenant {budget.tenant}")
+
+    def tenant_exhausted(self, tenant: str) -> bool:
+        """Whether the tenant has no budget left in the current window"""
+        if not self.tenant_token_limit:
+            return False
+        with self._condition:
+            return self._tenant_tokens(tenant) + self._tenant_reserved.get(tenant, 0) >= self.tenant_token_limit
+
+    @contextmanager
+    def admit(self, budget: RequestBudget, estimate: int, max_output_tokens: int = 0) -> Iterator[None]:
+        """
+        Wait for a call slot in priority order and reserve the estimated input
+        tokens plus max_output_tokens. The reservation is held until the block
+        exits, so the call is charged inside it.
+        """
+        reservation = estimate + max_output_tokens
+        with self._condition:
+            try:
+                self._check(budget, reservation)
+            except BudgetExceeded:
+                budget.rejected_calls += 1
+                raise
+            entry = (budget.priority, next(self._sequence))
+            heapq.heappush(self._waiting, entry)
+            queued = time.monotonic()
+            while self._active >= self.concurrency or self._waiting[0] != entry:
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            budget.queue_wait_ms += (time.monotonic() - queued) * 1000
+            try:
+                # Other calls of the same request or tenant may have finished while we waited
+                self._check(budget, reservation)
+            except BudgetExceeded:
+                budget.rejected_calls += 1
+                self._condition.notify_all()
+                raise
+            self._active += 1
+            budget.reserved_tokens += reservation
+            budget.estimated_input_tokens += estimate
+            if budget.tenant is not None:
+                self._tenant_reserved[budget.tenant] = self._tenant_reserved.get(budget.tenant, 0) + reservation
+            # The next waiter may take a remaining slot
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                budget.reserved_tokens -= reservation
+                if budget.tenant is not None:
+                    self._tenant_reserved[budget.tenant] -= reservation
+                self._condition.notify_all()
+
+    def charge(self, budget: RequestBudget, input_tokens: int, output_tokens: int, cost: float) -> None:
+        """
+        Record the tokens a finished call reported and their cost in USD. Called
+        inside the call's admit() block, so the reported tokens are counted
+        before its reservation is released and the budget is never undercounted.
+        """
+        with self._condition:
+            budget.input_tokens += input_tokens
+            budget.output_tokens += output_tokens
+            budget.cost += cost
+            budget.calls += 1
+            if budget.tenant is not None:
+                self._tenant_spend.setdefault(budget.tenant, deque()).append(
+                    (time.time(), input_tokens + output_tokens, cost))
+
+    def tenant_usage(self) -> Dict[str, Dict[str, Any]]:
+        """Tokens and cost per tenant within the current window"""
+        with self._condition:
+            usage = {}
+            for tenant in list(self._tenant_spend):
+                tokens = self._tenant_tokens(tenant)
+                usage[tenant] = {
+                    'tokens': tokens,
+                    'cost_usd': round(sum(entry[2] for entry in self._tenant_spend[tenant]), 4),
+                    'token_limit': self.tenant_token_limit or None,
+                    'window_seconds': self.tenant_window
+                }
+            return usage
+
+
+_scheduler: Optional[TokenScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> TokenScheduler:
+    """Return the process-wide scheduler shared by every Bedrock client"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TokenScheduler()
+        return _scheduler
@@ -15,9 +15,17 @@ Dependencies:
     - uuid: Generating unique session identifiers for reports
     - json: Parsing JSON data from form requests
     - os: Operating system interface for file and directory operations
-    - shutil: High-level file operations for cleanup functionality
     - time: Time-related functions for timestamp generation
     - Custom pipeline module: InclusivityPipeline for UI analysis
+    - BedrockClient: Shared, pooled Bedrock clients warmed up at startup
+    - BedrockCassette: Record/replay of Bedrock calls for offline runs
+    - rules_warmup: Background precomputation of per-persona rules analyses
+    - FindingsStore: SQLite index of every reported bug for cross-audit queries
+    - TokenScheduler: Priority admission and token budgets for model calls
+    - StorageManager: Background quota and age-based eviction of stored files
+
+For many concurrent analyses, serve through asgi.py instead, which runs
+/api/analyze on an event loop and delegates the other routes to this app.
 
 Author: 
     Rudrajit Choudhuri
@@ -26,16 +34,22 @@ Author:
 Version: 1.0
 """
 
+import threading
 import time
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 import os
 import uuid
-import shutil
 import json
 import pandas as pd
 from werkzeug.utils import secure_filename
 from pipeline import InclusivityPipeline  # Import your existing pipeline
+from BedrockClient import warm_up_bedrock_clients
+from BedrockCassette import get_cassette
+from rules_warmup import RulesWarmer
+from FindingsStore import FindingsStore, DEFAULT_TENANT
+from StorageManager import StorageManager, acquire_paths, release_paths
+from TokenScheduler import RequestBudget, get_scheduler, PRIORITIES
 
 # Initialize Flask application
 app = Flask(__name__)
@@ -50,8 +64,29 @@ CORS(app, origins="*", supports_credentials=True)
 
 # Directory paths for file storage (relative to the server directory)
 UPLOAD_FOLDER = os.path.join('images', 'screenshots')  # Where uploaded screenshots are stored
+ANALYSIS_UPLOAD_FOLDER = os.path.join(UPLOAD_FOLDER, 'analyses')  # One folder per /api/analyze request
 REPORT_FOLDER = 'reports'                              # Where generated PDF reports are saved
 RULES_CSV = 'Decision Rules.csv'                       # CSV file containing inclusivity decision rules
+FINDINGS_DB = os.environ.get('FINDINGS_DB', 'findings.db')  # SQLite index of all findings
+
+# API keys that identify tenants, as comma-separated "key:tenant" pairs. Callers
+# send their key in the X-API-Key header. Without keys, every caller belongs to
+# the default tenant, as on a single-team server.
+TENANT_API_KEYS = dict(
+    pair.strip().split(':', 1) for pair in os.environ.get('TENANT_API_KEYS', '').split(',') if ':' in pair
+)
+
+# Cascade mode: pre-screen each screenshot with the fast triage model and only
+# escalate screens/rules that need the full model (set CASCADE_MODE=1 to enable)
+CASCADE_MODE = os.environ.get('CASCADE_MODE', '0') == '1'
+
+# Default image-token budget per analysis request, split across its screenshots
+# (0 keeps the per-screenshot default of the image-budget stage)
+IMAGE_TOKEN_BUDGET = int(os.environ.get('IMAGE_TOKEN_BUDGET', 0))
+
+# Uploads with more images than this are scheduled as batch work unless the
+# request sets a priority, so bulk audits queue behind interactive analyses
+BATCH_IMAGE_THRESHOLD = int(os.environ.get('BATCH_IMAGE_THRESHOLD', 20))
 
 # Default persona for analysis (can be overridden by API requests)
 persona_id = 'ABI'  # Default persona identifier
@@ -60,36 +95,225 @@ persona_id = 'ABI'  # Default persona identifier
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(REPORT_FOLDER, exist_ok=True)
 
+# Persistent, queryable index of every finding produced by the pipeline
+findings_store = FindingsStore(FINDINGS_DB)
+
+# Precompute the rules analysis for every persona in the background, and again
+# whenever a rules CSV changes, so analyses do not wait on it
+RULES_WARMUP_INTERVAL = float(os.environ.get('RULES_WARMUP_INTERVAL', 30))
+# Longest wait between retries of a persona whose warm-up keeps failing
+RULES_WARMUP_MAX_BACKOFF = float(os.environ.get('RULES_WARMUP_MAX_BACKOFF', 3600))
+rules_warmer = RulesWarmer(RULES_CSV, poll_interval=RULES_WARMUP_INTERVAL, max_backoff=RULES_WARMUP_MAX_BACKOFF)
+
+# Keep uploads, resized images, reports and caches within their quotas and ages
+# (see StorageManager.DEFAULT_AREAS) without touching files of running analyses
+storage_manager = StorageManager()
+
+# ============================================================================
+# STARTUP
+# ============================================================================
+
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_background_services():
+    """
+    Start the server's background work once per serving process.
+    
+    Importing this module has no side effects beyond creating directories, so
+    the debug reloader's watcher process, spawned image-preparation workers
+    (image_prep) and tools that import the app make no AWS calls and start no
+    threads. Called by the entry point below, by the ASGI lifespan startup
+    (asgi.py), and before the first request otherwise.
+    """
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+    # Build the shared Bedrock clients and open their connections so the first
+    # analysis does not pay for client construction, credentials and TLS
+    try:
+        warm_up_bedrock_clients()
+    except Exception as e:
+        print(f"Bedrock warm-up failed: {e}")
+    storage_manager.start()
+    rules_warmer.start()
+
+@app.before_request
+def ensure_background_services():
+    """Start the background work for servers that import the app without the entry point"""
+    if not _services_started:
+        start_background_services()
+
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
-def cleanup_folder(folder, keep_file=None):
+def create_upload_dir():
     """
-    Clean up files and directories in a specified folder.
+    Create the upload folder of a new analysis request.
     
-    This function removes all items in a folder except for an optionally specified
-    file to keep. Used to maintain clean storage by removing old uploads and reports.
+    Each request analyses only the files it uploaded itself, never those of
+    other requests or of /api/save-image. The folder is leased against storage
+    eviction until complete_analysis (or an error) discards it.
+    
+    Returns:
+        tuple: (session_id, upload_dir)
+    """
+    session_id = str(uuid.uuid4())
+    upload_dir = os.path.join(ANALYSIS_UPLOAD_FOLDER, session_id)
+    os.makedirs(upload_dir)
+    acquire_paths([upload_dir])
+    return session_id, upload_dir
+
+def upload_path(upload_dir, filename):
+    """
+    Path to save an uploaded file to, under a safe name unique in its folder.
     
     Args:
-        folder (str): Path to the folder to clean up
-        keep_file (str, optional): Name of file to preserve during cleanup
+        upload_dir (str): The request's upload folder
+        filename (str): Filename sent by the client
         
     Returns:
-        None
-    """        
-    try:
-        # Iterate through all items in the specified folder        
-        for item in os.listdir(folder):
-            # Skip the file we want to keep
-            if item != keep_file:
-                item_path = os.path.join(folder, item)
-                # Remove directory recursively or single file based on type
-                (shutil.rmtree if os.path.isdir(item_path) else os.remove)(item_path)
-                print(f"Deleted: {item_path}")
-    except Exception as e:
-        print(f"Cleanup error in {folder}: {e}")
-            
+        str: Path in upload_dir that does not exist yet
+    """
+    name, extension = os.path.splitext(secure_filename(filename or '') or 'upload')
+    path = os.path.join(upload_dir, f'{name}{extension}')
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(upload_dir, f'{name}_{suffix}{extension}')
+        suffix += 1
+    return path
+
+def save_uploads(files, upload_dir):
+    """
+    Save the images of an analysis request into its upload folder.
+    
+    Args:
+        files (list): werkzeug FileStorage objects of the 'images' field
+        upload_dir (str): The request's upload folder
+        
+    Returns:
+        int: Number of files saved
+    """
+    saved = 0
+    for file in files:
+        if file.filename:
+            file.save(upload_path(upload_dir, file.filename))
+            saved += 1
+    return saved
+
+def parse_analysis_request(form, headers, image_count, session_id, upload_dir):
+    """
+    Validate an analysis request and derive its pipeline parameters.
+    
+    Shared by the Flask endpoint and the ASGI serving path (asgi.py) so both
+    honour the same REST contract.
+    
+    Args:
+        form: Form fields of the request (werkzeug MultiDict)
+        headers: Request headers, for the caller's API key (werkzeug Headers)
+        image_count (int): Number of images saved into upload_dir
+        session_id (str): ID of the request, from create_upload_dir
+        upload_dir (str): The request's upload folder
+        
+    Returns:
+        tuple: (params, None) on success, where params holds 'session_id',
+        'upload_dir', 'report_filename', 'budget' (RequestBudget for the
+        pipeline) and 'pipeline_args' for run_pipeline; or
+        (None, (error_body, status_code)) for a bad request, an unknown API
+        key or a tenant out of token budget
+    """
+    # Validate required inputs    
+    if not image_count:
+        return None, ({'error': 'No images provided'}, 400)
+    if 'persona' not in form:
+        return None, ({'error': 'No persona selected'}, 400)
+
+    # Extract persona information from form data
+    persona_name = json.loads(form.get('persona')).get('name')
+
+    # Optional image-token budget shared by all screenshots in this request
+    image_token_budget = form.get('image_token_budget', type=int) or IMAGE_TOKEN_BUDGET
+
+    # Token budgets are tracked per tenant, which the server derives from the API key
+    tenant = request_tenant(headers)
+    if tenant is None:
+        return None, ({'error': 'Missing or unknown API key'}, 401)
+    if get_scheduler().tenant_exhausted(tenant):
+        return None, ({'error': f'Token budget exhausted for tenant {tenant}, try again later'}, 429)
+    # Large uploads run at batch priority; clients may lower the priority, never raise it
+    priority = 'batch' if image_count > BATCH_IMAGE_THRESHOLD else 'interactive'
+    if form.get('priority') == 'batch':
+        priority = 'batch'
+
+    # Update global persona ID for use in other endpoints
+    global persona_id    
+    persona_id = persona_name.upper()
+
+    # Generate unique report filename and path
+    report_filename = f'inclusivity_report_{session_id}.pdf'
+    report_path = os.path.join(REPORT_FOLDER, report_filename)
+
+    return {
+        'session_id': session_id,
+        'upload_dir': upload_dir,
+        'report_filename': report_filename,
+        'budget': RequestBudget(tenant=tenant, priority=PRIORITIES[priority]),
+        'pipeline_args': {
+            'persona': persona_name,
+            'rules_csv_path': RULES_CSV,
+            'screenshots_dir': os.path.relpath(upload_dir, 'images'),  # Relative to the pipeline's images folder
+            'output_path': report_path,
+            'image_token_budget': image_token_budget,
+            'session_id': session_id
+        }
+    }, None
+
+def complete_analysis(params, results, run_metadata, input_files):
+    """
+    Clean up after a finished analysis and stream its response body.
+    
+    The analysis's leases are released and its upload folder (with the
+    resized images and keyframes derived from it) is deleted. Other requests
+    have their own folders, so nothing they use is touched.
+    
+    The body is produced as JSON text chunks with one chunk per analysis
+    result, read back from the pipeline's on-disk spool. Large uploads never
+    hold the whole response in memory. The spool is closed once the last
+    chunk has been produced.
+    
+    Args:
+        params (dict): Parameters returned by parse_analysis_request
+        results (ResultSpool): Spooled analysis results from the pipeline
+        run_metadata (dict): Run statistics collected by the pipeline
+        input_files (list): Uploaded files and keyframe folders the run leased
+        
+    Returns:
+        generator: str chunks of the /api/analyze success response body
+    """
+    release_paths(input_files)
+    storage_manager.discard([params['upload_dir']])
+
+    body = {
+        'success': True,
+        'report_id': params['session_id'],
+        'report_filename': params['report_filename'],
+        'metadata': run_metadata
+    }
+
+    def generate():
+        try:
+            yield json.dumps(body)[:-1] + ', "analysis_results": ['
+            for index, result in enumerate(results):
+                yield (', ' if index else '') + json.dumps(result)
+            yield ']}'
+        finally:
+            results.close()
+
+    return generate()
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -179,8 +403,17 @@ def analyze_images():
     Expected Request:
         - Method: POST
         - Content-Type: multipart/form-data
-        - Files: 'images' - One or more image files
+        - Files: 'images' - One or more image files or screen recordings
+          (.mp4, .mov, .webm, ...); recordings are analysed as one keyframe
+          per distinct UI state
         - Form data: 'persona' - JSON string containing persona information
+        - Form data: 'image_token_budget' (optional) - Image tokens to spread
+          across all screenshots; defaults to IMAGE_TOKEN_BUDGET
+        - Form data: 'priority' (optional) - 'batch' to run behind interactive
+          work; uploads of more than BATCH_IMAGE_THRESHOLD images always run
+          as batch
+        - Header: 'X-API-Key' - Identifies the tenant whose token budget is
+          charged, when TENANT_API_KEYS is set
         
     Returns:
         JSON response with:
@@ -188,59 +421,42 @@ def analyze_images():
         - report_id (str): Unique identifier for the generated report
         - report_filename (str): Name of the generated PDF report
         - analysis_results (dict): Detailed analysis results from pipeline
+        - metadata (dict): Run statistics: token spend and cost ('spend'),
+          and cascade escalation rates and measured model latency when
+          CASCADE_MODE is enabled
         - error (str): Error message (on failure)
         
     HTTP Status Codes:
         - 200: Analysis completed successfully
         - 400: Bad request (missing images or persona)
+        - 401: Missing or unknown API key
+        - 429: Tenant token budget exhausted
         - 500: Server error during analysis
     """
-    # Validate required inputs    
-    if 'images' not in request.files:
-        return jsonify({'error': 'No images provided'}), 400
-    if 'persona' not in request.form:
-        return jsonify({'error': 'No persona selected'}), 400
-
-    # Extract persona information from form data
-    persona_name = json.loads(request.form.get('persona')).get('name')
-
-    # Generate unique session ID for this analysis    
-    session_id = str(uuid.uuid4())
-
-    # Update global persona ID for use in other endpoints
-    global persona_id    
-    persona_id = persona_name.upper()
+    session_id, upload_dir = create_upload_dir()
+    try:
+        image_count = save_uploads(request.files.getlist('images'), upload_dir)
+    except Exception as e:
+        storage_manager.discard([upload_dir])
+        return jsonify({'error': f'Error saving uploads: {str(e)}'}), 500
+    params, error = parse_analysis_request(request.form, request.headers, image_count, session_id, upload_dir)
+    if error:
+        storage_manager.discard([upload_dir])
+        return jsonify(error[0]), error[1]
     
     try:
         # Initialize the inclusivity analysis pipeline
-        pipeline = InclusivityPipeline()
-
-        # Generate unique report filename and path
-        report_filename = f'inclusivity_report_{session_id}.pdf'
-        report_path = os.path.join(REPORT_FOLDER, report_filename)
+        pipeline = InclusivityPipeline(cascade=CASCADE_MODE, findings_store=findings_store, budget=params['budget'])
         
-        # Run the analysis pipeline with provided parameters
-        results = pipeline.run_pipeline(
-            persona=persona_name,
-            rules_csv_path=RULES_CSV,
-            screenshots_dir="screenshots",  # Relative path used by pipeline
-            output_path=report_path
-        )
+        # Run the analysis pipeline with provided parameters; results are spooled to disk
+        results = pipeline.run_pipeline_streaming(**params['pipeline_args'])
 
-        # Clean up storage: remove uploaded files and old reports
-        cleanup_folder(UPLOAD_FOLDER)  # Delete all uploaded files
-        cleanup_folder(REPORT_FOLDER, report_filename)  # Keep only current report
-
-        # Return successful analysis results
-        return jsonify({
-            'success': True,
-            'report_id': session_id,
-            'report_filename': report_filename,
-            'analysis_results': results
-        })
+        # Stream successful analysis results back from the spool
+        return Response(complete_analysis(params, results, pipeline.run_metadata, pipeline.input_files), mimetype='application/json')
         
     except Exception as e:
-        # Handle any errors during analysis
+        # Handle any errors during analysis; the pipeline already released its leases
+        storage_manager.discard([upload_dir])
         return jsonify({'error': str(e)}), 500
 
         
@@ -350,6 +566,169 @@ def get_rules():
         # Handle errors in file reading or processing        
         return jsonify({'error': f'Error reading rules: {str(e)}'}), 500
 
+def request_tenant(headers):
+    """
+    Tenant a request acts for, as determined by the server.
+    
+    Args:
+        headers: Request headers (werkzeug Headers or a dict)
+        
+    Returns:
+        str: The tenant of the request's API key (DEFAULT_TENANT when no keys
+        are configured), or None for a missing or unknown key
+    """
+    if not TENANT_API_KEYS:
+        return DEFAULT_TENANT
+    return TENANT_API_KEYS.get(headers.get('X-API-Key', ''))
+
+def findings_filters():
+    """
+    Collect findings filters from the query string.
+    
+    Supported parameters: session_id, persona, screenshot_digest, rule_id,
+    severity, category, and since/until (ISO-8601 timestamps, UTC).
+    """
+    names = ('session_id', 'persona', 'screenshot_digest', 'rule_id', 'severity', 'category', 'since', 'until')
+    return {name: request.args.get(name) for name in names if request.args.get(name)}
+
+@app.route('/api/findings', methods=['GET'])
+def get_findings():
+    """
+    Query stored findings across all analyses of the caller's tenant.
+    
+    Every bug reported by /api/analyze is indexed by tenant, session,
+    screenshot digest, persona, rule ID, severity and category, so
+    cross-audit questions ("all High-severity DR3 bugs this quarter") do not
+    need a re-run. The tenant comes from the X-API-Key header, never from
+    the query string.
+    
+    Query Parameters:
+        - Filters: see findings_filters()
+        - page (int, optional): 1-based page number (default 1)
+        - page_size (int, optional): Findings per page (default 50, max 500)
+        
+    Returns:
+        JSON response with:
+        - findings (list): Matching findings, newest first
+        - page, page_size, total, pages (int): Pagination details
+        - error (str): Error message (on failure)
+        
+    HTTP Status Codes:
+        - 200: Query succeeded
+        - 400: Invalid filter
+        - 401: Missing or unknown API key
+    """
+    tenant = request_tenant(request.headers)
+    if tenant is None:
+        return jsonify({'error': 'Missing or unknown API key'}), 401
+    try:
+        return jsonify(findings_store.query(
+            tenant,
+            page=request.args.get('page', 1, type=int),
+            page_size=request.args.get('page_size', 50, type=int),
+            **findings_filters()
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/findings/summary', methods=['GET'])
+def get_findings_summary():
+    """
+    Aggregate the stored findings of the caller's tenant.
+    
+    Query Parameters:
+        - group_by (str): One of session_id, persona, screenshot_digest,
+          screenshot_name, rule_id, severity or category (default rule_id)
+        - Filters: see findings_filters()
+        
+    Returns:
+        JSON response with:
+        - group_by (str): The grouping column
+        - groups (list): {value, count} per group, largest first
+        - total (int): Sum of the group counts (a finding with several
+          categories counts once per category)
+        - error (str): Error message (on failure)
+        
+    HTTP Status Codes:
+        - 200: Query succeeded
+        - 400: Invalid group_by or filter
+        - 401: Missing or unknown API key
+    """
+    tenant = request_tenant(request.headers)
+    if tenant is None:
+        return jsonify({'error': 'Missing or unknown API key'}), 401
+    try:
+        return jsonify(findings_store.aggregate(tenant, request.args.get('group_by', 'rule_id'), **findings_filters()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """
+    Report server health and readiness.
+    
+    The server is ready once the rules analysis for every persona rules CSV
+    has been precomputed and validated by the background warm-up.
+    
+    Returns:
+        JSON response with:
+        - status (str): 'ok' when ready, 'warming' otherwise
+        - ready (bool): Whether every persona's rules analysis is cached
+        - personas (dict): Warm-up state per persona ('pending', 'warming',
+          'ready' or 'failed'), with timing or error details
+        
+    HTTP Status Codes:
+        - 200: Server is ready
+        - 503: Rules analyses are still warming up or failed
+    """
+    report = rules_warmer.report()
+    report['status'] = 'ok' if report['ready'] else 'warming'
+    return jsonify(report), 200 if report['ready'] else 503
+
+@app.route('/api/usage', methods=['GET'])
+def usage():
+    """
+    Report the caller's model token spend.
+    
+    Spend is taken from the input/output token counts Bedrock reports for
+    each call, over the rolling tenant budget window. Only the tenant of the
+    X-API-Key header is reported.
+    
+    Returns:
+        JSON response with:
+        - tenants (dict): For the caller's tenant (if it spent anything),
+          'tokens' and 'cost_usd' spent in the window, 'token_limit' and
+          'window_seconds'
+        - cassette (dict): Bedrock record/replay mode and the calls recorded,
+          replayed or missing from the cassette
+        
+    HTTP Status Codes:
+        - 200: Usage returned successfully
+        - 401: Missing or unknown API key
+    """
+    tenant = request_tenant(request.headers)
+    if tenant is None:
+        return jsonify({'error': 'Missing or unknown API key'}), 401
+    tenants = {name: spend for name, spend in get_scheduler().tenant_usage().items() if name == tenant}
+    return jsonify({'tenants': tenants, 'cassette': get_cassette().report()})
+
+@app.route('/api/storage', methods=['GET'])
+def storage():
+    """
+    Report disk usage per storage area.
+    
+    Returns:
+        JSON response with:
+        - areas (dict): Per area (uploads, resized, reports, cache, locks,
+          spool), its path, file count, bytes used, quota, max file age and
+          what the last background sweep evicted
+        - disk (dict): Total, used and free bytes of the volume
+        
+    HTTP Status Codes:
+        - 200: Usage returned successfully
+    """
+    return jsonify(storage_manager.usage())
+
 # ============================================================================
 # APPLICATION ENTRY POINT
 # ============================================================================
@@ -363,4 +742,8 @@ if __name__ == '__main__':
         - Port: 5000 (default Flask port)
         - Host: localhost (default)
     """
+    # The debug reloader runs this module in a watcher and a serving child
+    # process; only the serving child starts the background work
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,310 @@
+# asgi.py
+"""
+ASGI entry point for the inclusivity analysis server.
+
+POST /api/analyze is served natively on the event loop: the upload is streamed
+to disk as it arrives, and the pipeline runs as coroutines (AsyncInclusivityPipeline)
+with Bedrock calls on a bounded executor and PDF rendering through Playwright's
+async API. One process can therefore hold hundreds of analyses that are waiting
+on the model, with memory bounded by the executor and render limits rather than
+by one OS thread per request. Every other route is served by the existing Flask
+app through asgiref's WSGI adapter, so the REST contract used by
+client/src/controllers is unchanged.
+
+Dependencies:
+    - asgiref: WsgiToAsgi adapter for the Flask routes
+    - uvicorn: ASGI server
+    - werkzeug: Streaming multipart parsing of the upload
+    - Custom app module: Flask app and the shared request/response helpers
+    - Custom async_pipeline module: AsyncInclusivityPipeline
+
+Usage:
+    uvicorn asgi:application --port 5000
+"""
+
+import asyncio
+import json
+import os
+import re
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, Epilogue, Field, File, Data
+from app import (app, findings_store, storage_manager, create_upload_dir, upload_path, parse_analysis_request,
+                 complete_analysis, start_background_services, CASCADE_MODE)
+from async_pipeline import AsyncInclusivityPipeline
+from pipeline import InclusivityPipeline
+
+# Largest /api/analyze request body accepted on the async path
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 200 * 1024 * 1024))
+# Largest total size of the non-file form fields (persona, budget, ...)
+MAX_FORM_FIELD_BYTES = int(os.environ.get('MAX_FORM_FIELD_BYTES', 1024 * 1024))
+
+LINE_BREAK_RE = re.compile(rb'[\r\n]')
+
+flask_application = WsgiToAsgi(app)
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+class UploadReader:
+    """
+    Streaming parser of a multipart /api/analyze request body.
+
+    Each chunk of the body is decoded as it arrives: the 'images' files are
+    written straight into the request's upload folder, and the other form
+    fields are collected. The body itself is never held in memory, so a
+    request costs one chunk of memory however large its upload.
+
+    Chunks are fed on the executor, since parsing and writing are blocking.
+    """
+
+    def __init__(self, content_type, upload_dir):
+        mimetype, options = parse_options_header(content_type)
+        boundary = options.get('boundary', '') if mimetype == 'multipart/form-data' else ''
+        self.decoder = MultipartDecoder(boundary.encode('latin-1')) if boundary else None
+        # Longest tail that can hold an incomplete boundary line ("\r\n--<boundary>--\r\n")
+        self.tail_bytes = len(boundary) + 8
+        self.held = b''
+        self.upload_dir = upload_dir
+        self.form = MultiDict()
+        self.image_count = 0
+        self.field_bytes = 0
+        self.part = None    # ('field', name, bytearray), ('file', file) or ('skip',)
+
+    def feed(self, data):
+        """
+        Decode a chunk of the body, or the end of it when data is None.
+
+        Raises:
+            RequestEntityTooLarge: If the form fields exceed MAX_FORM_FIELD_BYTES
+            ValueError: If the body is not valid multipart data
+        """
+        if self.decoder is None:
+            return
+        if data is None:
+            self.decoder.receive_data(self.held)
+        else:
+            # The decoder can pass a line break of the boundary through as file data
+            # when a chunk ends inside the boundary line, so a trailing line break
+            # and what follows it wait for the next chunk
+            data = self.held + data
+            line_break = LINE_BREAK_RE.search(data, max(0, len(data) - self.tail_bytes))
+            split = line_break.start() if line_break else len(data)
+            data, self.held = data[:split], data[split:]
+        self.decoder.receive_data(data)
+        event = self.decoder.next_event()
+        while not isinstance(event, (NeedData, Epilogue)):
+            if isinstance(event, File):
+                self.end_part()
+                if event.name == 'images' and event.filename:
+                    self.part = ('file', open(upload_path(self.upload_dir, event.filename), 'wb'))
+                    self.image_count += 1
+                else:
+                    self.part = ('skip',)
+            elif isinstance(event, Field):
+                self.end_part()
+                self.part = ('field', event.name, bytearray())
+            elif isinstance(event, Data) and self.part is not None:
+                if self.part[0] == 'file':
+                    self.part[1].write(event.data)
+                elif self.part[0] == 'field':
+                    self.field_bytes += len(event.data)
+                    if self.field_bytes > MAX_FORM_FIELD_BYTES:
+                        raise RequestEntityTooLarge()
+                    self.part[2].extend(event.data)
+                if not event.more_data:
+                    self.end_part()
+            event = self.decoder.next_event()
+
+    def end_part(self):
+        if self.part is None:
+            return
+        if self.part[0] == 'file':
+            self.part[1].close()
+        elif self.part[0] == 'field':
+            self.form.add(self.part[1], self.part[2].decode('utf-8', 'replace'))
+        self.part = None
+
+    def close(self):
+        if self.part is not None and self.part[0] == 'file':
+            self.part[1].close()
+        self.part = None
+
+async def read_upload(receive, reader, limit):
+    """
+    Stream the request body from the ASGI receive channel into an UploadReader.
+
+    Args:
+        receive: ASGI receive callable
+        reader (UploadReader): Parser writing into the request's upload folder
+        limit (int): Maximum number of body bytes to accept
+
+    Returns:
+        bool: True once the whole body is parsed, False if it exceeds the limit
+    """
+    loop = asyncio.get_running_loop()
+    received = 0
+    more_body = True
+    try:
+        while more_body:
+            message = await receive()
+            chunk = message.get('body', b'')
+            received += len(chunk)
+            if received > limit:
+                return False
+            more_body = message.get('more_body', False)
+            if chunk:
+                await loop.run_in_executor(None, reader.feed, chunk)
+        await loop.run_in_executor(None, reader.feed, None)
+        return True
+    finally:
+        reader.close()
+
+def cors_headers(scope):
+    """
+    CORS headers matching what Flask-CORS adds for the Flask routes.
+
+    Args:
+        scope (dict): ASGI connection scope
+
+    Returns:
+        list: ASGI header tuples (empty for requests without an Origin)
+    """
+    origin = dict(scope['headers']).get(b'origin')
+    if not origin:
+        return []
+    return [(b'access-control-allow-origin', origin),
+            (b'access-control-allow-credentials', b'true'),
+            (b'vary', b'Origin')]
+
+async def send_json(send, scope, body, status=200):
+    """
+    Send a JSON response with CORS headers.
+
+    Args:
+        send: ASGI send callable
+        scope (dict): ASGI connection scope
+        body (dict): Response body
+        status (int): HTTP status code
+    """
+    payload = json.dumps(body).encode()
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())]
+    headers += cors_headers(scope)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': payload})
+
+async def send_stream(send, scope, chunks):
+    """
+    Send a streamed JSON response from a generator of text chunks.
+
+    Chunks are produced on the executor, since they are read from disk.
+
+    Args:
+        send: ASGI send callable
+        scope (dict): ASGI connection scope
+        chunks (generator): str chunks of the response body
+    """
+    loop = asyncio.get_running_loop()
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/json')] + cors_headers(scope)})
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        chunks.close()
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+async def analyze_images(scope, receive, send):
+    """
+    Async implementation of POST /api/analyze.
+
+    Accepts and returns exactly what app.analyze_images does; see its
+    docstring for the request and response format.
+
+    HTTP Status Codes:
+        - 200: Analysis completed successfully
+        - 400: Bad request (missing images or persona, malformed multipart body)
+        - 401: Missing or unknown API key
+        - 413: Upload larger than MAX_UPLOAD_BYTES, or form fields larger
+          than MAX_FORM_FIELD_BYTES
+        - 429: Tenant token budget exhausted
+        - 500: Server error during analysis
+    """
+    loop = asyncio.get_running_loop()
+    session_id, upload_dir = await loop.run_in_executor(None, create_upload_dir)
+    headers = Headers([(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']])
+    reader = UploadReader(headers.get('Content-Type', ''), upload_dir)
+    try:
+        complete = await read_upload(receive, reader, MAX_UPLOAD_BYTES)
+    except (RequestEntityTooLarge, ValueError) as e:
+        await loop.run_in_executor(None, storage_manager.discard, [upload_dir])
+        if isinstance(e, RequestEntityTooLarge):
+            return await send_json(send, scope, {'error': 'Form fields too large'}, 413)
+        return await send_json(send, scope, {'error': f'Malformed upload: {str(e)}'}, 400)
+    if not complete:
+        await loop.run_in_executor(None, storage_manager.discard, [upload_dir])
+        return await send_json(send, scope, {'error': 'Upload too large'}, 413)
+
+    params, error = await loop.run_in_executor(
+        None, parse_analysis_request, reader.form, headers, reader.image_count, session_id, upload_dir)
+    # Only the parsed fields are needed from here on
+    del reader
+    if error:
+        await loop.run_in_executor(None, storage_manager.discard, [upload_dir])
+        return await send_json(send, scope, error[0], error[1])
+
+    try:
+        # Initialize the inclusivity analysis pipeline
+        pipeline = AsyncInclusivityPipeline(InclusivityPipeline(
+            cascade=CASCADE_MODE, findings_store=findings_store, budget=params['budget']))
+
+        # Run the analysis pipeline without blocking the event loop; results are spooled to disk
+        results = await pipeline.run_pipeline_streaming(**params['pipeline_args'])
+
+        # Clean up on the executor, then stream successful analysis results back from the spool
+        chunks = await loop.run_in_executor(None, complete_analysis, params, results,
+                                            pipeline.run_metadata, pipeline.input_files)
+        await send_stream(send, scope, chunks)
+
+    except Exception as e:
+        # Handle any errors during analysis
+        await loop.run_in_executor(None, storage_manager.discard, [upload_dir])
+        await send_json(send, scope, {'error': str(e)}, 500)
+
+# ============================================================================
+# APPLICATION ENTRY POINT
+# ============================================================================
+
+async def lifespan(receive, send):
+    """
+    ASGI lifespan protocol: start the app's background work once the server
+    process is up, rather than when the module is imported.
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.get_running_loop().run_in_executor(None, start_background_services)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    """
+    ASGI application: async /api/analyze, everything else through Flask.
+    """
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == '/api/analyze':
+        return await analyze_images(scope, receive, send)
+    return await flask_application(scope, receive, send)
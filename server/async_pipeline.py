@@ -0,0 +1,173 @@
+# async_pipeline.py
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import List, Dict, Any, Optional, Callable
+from BedrockCassette import CassetteMiss
+from BedrockClient import BEDROCK_MAX_POOL_CONNECTIONS
+from pdf_generator_v2 import generate_inclusivity_report_async
+from pipeline import InclusivityPipeline
+from ResultSpool import ResultSpool
+
+# boto3 has no native async client, so blocking Bedrock calls run on one bounded,
+# process-wide executor sized to the HTTP connection pool. Waiting analyses are
+# coroutines and cost no thread of their own. Queued work starts in priority order,
+# like model calls in the TokenScheduler: a FIFO queue would let a large batch
+# request hold every thread, so a later interactive request could not even reach
+# the scheduler until the batch drained.
+#
+# Concurrency ceiling of one server process:
+#   - pipeline work (file reads, model calls, spool writes): BEDROCK_EXECUTOR_WORKERS
+#     threads in total, across all requests; a stage never starts threads of its own
+#     (a tiled screenshot is one model call, see InclusivityPipeline.compute_analysis)
+#   - model calls in flight: at most min(BEDROCK_EXECUTOR_WORKERS, BEDROCK_CONCURRENCY),
+#     the second being the TokenScheduler's admission limit
+#   - screenshots per request: SCREENSHOT_CONCURRENCY, queued on the same executor by priority
+#   - image resizing: IMAGE_PREP_WORKERS processes (image_prep), shared by all requests
+#   - upload parsing and response streaming (asgi.py): the event loop's default executor
+BEDROCK_EXECUTOR_WORKERS = int(os.environ.get('BEDROCK_EXECUTOR_WORKERS', BEDROCK_MAX_POOL_CONNECTIONS))
+# Screenshots of a single request analysed at the same time
+SCREENSHOT_CONCURRENCY = int(os.environ.get('SCREENSHOT_CONCURRENCY', 4))
+
+_executor: Optional["PriorityExecutor"] = None
+_executor_lock = threading.Lock()
+
+
+class PriorityExecutor:
+    """
+    Thread pool that starts queued calls in priority order (lower values first,
+    see TokenScheduler), then in submission order. Threads are started as work
+    arrives, up to max_workers.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = ''):
+        self.max_workers = max(1, max_workers)
+        self.thread_name_prefix = thread_name_prefix
+        self._condition = threading.Condition()
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._idle = 0
+
+    def submit(self, priority: int, fn: Callable, *args: Any) -> Future:
+        future: Future = Future()
+        with self._condition:
+            heapq.heappush(self._queue, (priority, next(self._sequence), future, partial(fn, *args)))
+            if self._idle == 0 and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work, daemon=True,
+                                          name=f"{self.thread_name_prefix}_{len(self._threads)}")
+                self._threads.append(thread)
+                thread.start()
+            else:
+                self._condition.notify()
+        return future
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                self._idle += 1
+                while not self._queue:
+                    self._condition.wait()
+                self._idle -= 1
+                _, _, future, call = heapq.heappop(self._queue)
+            # Calls whose awaiting coroutine was cancelled are dropped
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = call()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+def get_executor() -> PriorityExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = PriorityExecutor(max_workers=BEDROCK_EXECUTOR_WORKERS, thread_name_prefix='bedrock')
+        return _executor
+
+
+class AsyncInclusivityPipeline:
+    """
+    Coroutine version of InclusivityPipeline.run_pipeline for the ASGI server.
+
+    Every stage is awaited: file reads and model calls run on the bounded
+    executor, screenshots of a request are analysed concurrently, and the PDF
+    is rendered through Playwright's async API.
+    """
+
+    def __init__(self, pipeline: InclusivityPipeline):
+        self.pipeline = pipeline
+
+    @property
+    def run_metadata(self) -> Dict[str, Any]:
+        return self.pipeline.run_metadata
+
+    @property
+    def input_files(self) -> List[str]:
+        return self.pipeline.input_files
+
+    async def _run(self, fn: Callable, *args: Any) -> Any:
+        """Run a blocking call on the shared executor, queued at this request's priority"""
+        return await asyncio.wrap_future(get_executor().submit(self.pipeline.budget.priority, fn, *args))
+
+    async def run_pipeline_streaming(self, persona: str, rules_csv_path: str, screenshots_dir: str, output_path: str,
+                                     image_token_budget: Optional[int] = None,
+                                     session_id: Optional[str] = None) -> ResultSpool:
+        """Run the complete pipeline without blocking the event loop, spooling results to disk"""
+        results = None
+        prep_stage = None
+        try:
+            self.pipeline.start_run()
+            rules = await self._run(self.pipeline.read_decision_rules, rules_csv_path, persona)
+            rules_analysis = await self._run(self.pipeline.generate_rules_analysis, rules)
+
+            screenshot_paths = await self._run(self.pipeline.list_screenshots, screenshots_dir)
+            screenshot_budget = self.pipeline.screenshot_budget(image_token_budget, len(screenshot_paths))
+            prep_stage = await self._run(self.pipeline.start_image_prep, persona, screenshot_paths,
+                                         rules_analysis, screenshot_budget)
+            semaphore = asyncio.Semaphore(SCREENSHOT_CONCURRENCY)
+            results = ResultSpool()
+
+            async def process(index: int, screenshot_path: str) -> None:
+                async with semaphore:
+                    print(f"Processing screenshot: {screenshot_path}")
+                    analysis = await self._run(self.pipeline.process_screenshot, persona, screenshot_path,
+                                               rules, rules_analysis, screenshot_budget, session_id, prep_stage)
+                # Results complete out of order; the spool index keeps screenshot order
+                await self._run(results.append, analysis, index)
+                self.pipeline.record_result(analysis)
+
+            await asyncio.gather(*[process(index, path) for index, path in enumerate(screenshot_paths)])
+            self.pipeline.finish_run(rules)
+
+            report_started = time.time()
+            await generate_inclusivity_report_async(rules, results, output_path)
+            self.pipeline.record_report_stage(report_started)
+            return results
+
+        except Exception as e:
+            if results is not None:
+                results.close()
+            self.pipeline.release_inputs()
+            if isinstance(e, CassetteMiss):
+                raise
+            raise Exception(f"Pipeline error: {str(e)}")
+        finally:
+            if prep_stage is not None:
+                prep_stage.close()
+
+    async def run_pipeline(self, persona: str, rules_csv_path: str, screenshots_dir: str, output_path: str,
+                           image_token_budget: Optional[int] = None, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Run the complete pipeline and return all results as a list"""
+        with await self.run_pipeline_streaming(persona, rules_csv_path, screenshots_dir, output_path,
+                                               image_token_budget, session_id) as results:
+            self.pipeline.release_inputs()
+            return list(results)
@@ -0,0 +1,169 @@
+# bench_memory.py
+"""
+Peak-memory benchmark for large uploads: in-memory results vs. streaming spool.
+
+Generates synthetic screenshots, replaces the Bedrock call with a canned
+response (no AWS access or model cost), and runs the pipeline up to the
+report HTML in a fresh subprocess per mode, so each peak RSS is measured
+separately. Playwright is skipped because Chromium runs in its own process.
+
+Modes:
+    - list: the previous behaviour, with every result kept in a Python list
+      (plus a second base64 copy per screenshot) and the report HTML
+      rendered as one string
+    - streaming: run_pipeline_streaming spools results to disk and the
+      report HTML is written section by section
+
+Usage:
+    python bench_memory.py --screenshots 200
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import random
+from PIL import Image, ImageDraw
+
+FAKE_ANALYSIS = {
+    'screenshot': 'screen.png',
+    'violations': [{
+        'rule_id': 'DR2',
+        'bugs': [{
+            'description': 'Primary action is rendered as plain text',
+            'categories': 'Unclear action requirements - obscure UI',
+            'location': 'Bottom of the form',
+            'severity': 'High',
+            'recommendation': 'Style the action as a button'
+        }]
+    }]
+}
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def make_screenshots(directory, count, width, height):
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(0)
+    for index in range(count):
+        image = Image.new('RGB', (width, height), 'white')
+        draw = ImageDraw.Draw(image)
+        for _ in range(60):
+            x, y = rng.randrange(width - 200), rng.randrange(height - 60)
+            draw.rectangle((x, y, x + rng.randrange(50, 200), y + rng.randrange(20, 60)),
+                           fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        # A noisy band keeps PNGs from compressing to nothing, like real UI imagery
+        band = Image.effect_noise((width, height // 8), 64).convert('RGB')
+        image.paste(band, (0, (index * 97) % (height - band.height)))
+        image.save(os.path.join(directory, f"screen_{index:04d}.png"))
+
+def run_mode(mode, workdir):
+    os.chdir(workdir)
+    # The client is never used for real calls, but boto3 needs a region to build it
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import BedrockClient
+    import pipeline as pipeline_module
+    import pdf_generator_v2
+
+    def fake_call_claude(self, prompt, image_paths, max_tokens=8192, prepared=False, budget=None):
+        # Build the message like a real call so image encoding is still measured
+        self.prepare_message(prompt, image_paths, prepared)
+        if not image_paths:
+            return {'response': json.dumps([{'rule_id': rule_id, 'analysis': {}} for rule_id in RULE_IDS]),
+                    'metadata': {'input_tokens': 0, 'output_tokens': 0, 'latency': 0, 'model_id': self.MODEL_ID}}
+        return {'response': json.dumps(FAKE_ANALYSIS),
+                'metadata': {'input_tokens': 1500, 'output_tokens': 300, 'latency': 0, 'model_id': self.MODEL_ID}}
+
+    def legacy_report(rules, results, output_path):
+        # Pre-streaming report: a second base64 copy per result and one HTML string
+        generator = pdf_generator_v2.ModernPDFGenerator(output_path)
+        for result in results:
+            result['screenshot_base64'] = generator._encode_image_to_base64(result['screenshot_path'])
+        html = generator.env.get_template('report_template.html').render(
+            date='', rules=rules, results=results, format_name=generator._format_screenshot_name,
+            get_severity_styles=generator._get_severity_styles, logo_base64='')
+        with open(output_path, 'w') as f:
+            f.write(html)
+
+    def streaming_report(rules, results, output_path):
+        html_path = pdf_generator_v2.ModernPDFGenerator(output_path).render_html(rules, results)
+        shutil.move(html_path, output_path)
+
+    def run_list_baseline(pipeline, persona, rules_csv_path, screenshots_dir, output_path):
+        # The pipeline loop as it was before spooling: results accumulate in memory
+        pipeline.start_run()
+        rules = pipeline.read_decision_rules(rules_csv_path, persona)
+        rules_analysis = pipeline.generate_rules_analysis(rules)
+        screenshot_paths = pipeline.list_screenshots(screenshots_dir)
+        screenshot_budget = pipeline.screenshot_budget(None, len(screenshot_paths))
+        prep_stage = pipeline.start_image_prep(persona, screenshot_paths, rules_analysis, screenshot_budget)
+        results = []
+        try:
+            for screenshot_path in screenshot_paths:
+                analysis = pipeline.process_screenshot(
+                    persona, screenshot_path, rules, rules_analysis, screenshot_budget, None, prep_stage)
+                results.append(analysis)
+                pipeline.record_result(analysis)
+        finally:
+            prep_stage.close()
+        pipeline.finish_run(rules)
+        legacy_report(rules, results, output_path)
+        pipeline.release_inputs()
+        return results
+
+    BedrockClient.BedrockClient.call_claude = fake_call_claude
+    pipeline_module.time.sleep = lambda seconds: None
+    pipeline_module.generate_inclusivity_report = streaming_report
+
+    pipeline = pipeline_module.InclusivityPipeline()
+    RULE_IDS = [rule['Rule ID'] for rule in pipeline.read_decision_rules('Decision Rules.csv', 'ABI')]
+    started = time.time()
+    if mode == 'list':
+        results = run_list_baseline(pipeline, 'ABI', 'Decision Rules.csv', 'screenshots', 'report.html')
+        count = len(results)
+    else:
+        with pipeline.run_pipeline_streaming('ABI', 'Decision Rules.csv', 'screenshots', 'report.html') as results:
+            count = len(results)
+    print(json.dumps({
+        'mode': mode,
+        'screenshots': count,
+        'seconds': round(time.time() - started, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'report_mb': round(os.path.getsize('report.html') / (1024 * 1024), 1)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--screenshots', type=int, default=200)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=2400)
+    parser.add_argument('--mode', choices=['list', 'streaming'])
+    parser.add_argument('--workdir')
+    args = parser.parse_args()
+
+    if args.mode:
+        return run_mode(args.mode, args.workdir)
+
+    server_dir = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix='bench_memory_')
+    try:
+        make_screenshots(os.path.join(workdir, 'images', 'screenshots'), args.screenshots, args.width, args.height)
+        shutil.copy(os.path.join(server_dir, 'ABI_Decision Rules.csv'), workdir)
+        shutil.copytree(os.path.join(server_dir, 'templates'), os.path.join(workdir, 'templates'))
+        for mode in ('list', 'streaming'):
+            # Fresh cache per mode so both do the same work
+            shutil.rmtree(os.path.join(workdir, 'cache'), ignore_errors=True)
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode, '--workdir', workdir], check=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
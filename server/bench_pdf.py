@@ -0,0 +1,124 @@
+# bench_pdf.py
+"""
+Throughput and memory benchmark for the PDF report backends.
+
+Renders the same synthetic reports with each backend in a fresh subprocess:
+    - chromium: report_template.html printed by headless Chromium (Playwright)
+    - reportlab: the native ReportLab renderer, no browser
+
+Reports are rendered through generate_inclusivity_report_async, as on the
+ASGI serving path, with --concurrency reports in flight at once. Peak RSS is
+reported for the Python process and for its largest child process (the
+Playwright driver or Chromium); the reportlab backend starts no children.
+The chromium backend is skipped only when Playwright or its Chromium build is
+not installed; any other failure stops the benchmark.
+
+Usage:
+    python bench_pdf.py --reports 20 --screenshots 10 --concurrency 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from bench_memory import FAKE_ANALYSIS, make_screenshots, peak_rss_mb
+
+def children_peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def chromium_missing():
+    """Why the chromium backend cannot run here, or None if it can"""
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        return 'playwright is not installed (pip install playwright)'
+    with sync_playwright() as playwright:
+        if not os.path.exists(playwright.chromium.executable_path):
+            return 'Chromium is not installed (playwright install chromium)'
+    return None
+
+def run_backend(backend, workdir, reports, concurrency):
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import pandas as pd
+    import pdf_generator_v2
+
+    rules = pd.read_csv('ABI_Decision Rules.csv').to_dict('records')
+    screenshots = sorted(os.listdir(os.path.join('images', 'screenshots')))
+    results = [{
+        **FAKE_ANALYSIS,
+        'screenshot': screenshot,
+        'screenshot_path': os.path.join(workdir, 'images', 'screenshots', screenshot),
+        # Every rule of the persona is violated once, to give each report rule sections
+        'violations': [{**FAKE_ANALYSIS['violations'][0], 'rule_id': rule['Rule ID']} for rule in rules[:3]]
+    } for screenshot in screenshots]
+
+    async def render_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        # The render limit of the serving path would otherwise cap chromium below --concurrency
+        pdf_generator_v2.PDF_RENDER_CONCURRENCY = concurrency
+
+        async def render(index):
+            async with semaphore:
+                await pdf_generator_v2.generate_inclusivity_report_async(
+                    rules, iter(results), os.path.join('reports', f'report_{index}.pdf'), backend=backend)
+
+        await asyncio.gather(*[render(index) for index in range(reports)])
+
+    os.makedirs('reports', exist_ok=True)
+    started = time.time()
+    asyncio.run(render_all())
+    seconds = time.time() - started
+    sizes = [os.path.getsize(os.path.join('reports', name)) for name in os.listdir('reports')]
+    print(json.dumps({
+        'backend': backend,
+        'reports': reports,
+        'screenshots_per_report': len(results),
+        'seconds': round(seconds, 2),
+        'reports_per_second': round(reports / seconds, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'peak_child_rss_mb': round(children_peak_rss_mb(), 1),
+        'avg_report_kb': round(sum(sizes) / len(sizes) / 1024, 1)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=20)
+    parser.add_argument('--screenshots', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=2)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=2400)
+    parser.add_argument('--backend', choices=['chromium', 'reportlab'])
+    parser.add_argument('--workdir')
+    args = parser.parse_args()
+
+    if args.backend:
+        return run_backend(args.backend, args.workdir, args.reports, args.concurrency)
+
+    server_dir = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix='bench_pdf_')
+    try:
+        make_screenshots(os.path.join(workdir, 'images', 'screenshots'), args.screenshots, args.width, args.height)
+        shutil.copy(os.path.join(server_dir, 'ABI_Decision Rules.csv'), workdir)
+        shutil.copy(os.path.join(server_dir, 'logo.png'), workdir)
+        shutil.copytree(os.path.join(server_dir, 'templates'), os.path.join(workdir, 'templates'))
+        for backend in ('chromium', 'reportlab'):
+            missing = chromium_missing() if backend == 'chromium' else None
+            if missing:
+                print(json.dumps({'backend': backend, 'skipped': missing}))
+                continue
+            shutil.rmtree(os.path.join(workdir, 'reports'), ignore_errors=True)
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--backend', backend, '--workdir', workdir,
+                            '--reports', str(args.reports), '--concurrency', str(args.concurrency)], check=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# image_budget.py
+import hashlib
+import math
+import os
+import threading
+import numpy as np
+from PIL import Image
+from typing import List, Dict, Any
+from BedrockClient import IMAGE_DIMENSION_LIMIT
+
+# Claude bills roughly one input token per 750 pixels of the image it receives
+PIXELS_PER_TOKEN = 750
+# Never shrink the long side below this, or UI text stops being readable
+MIN_IMAGE_DIMENSION = int(os.environ.get('MIN_IMAGE_DIMENSION', 512))
+# Default per-screenshot budget: what a full-size IMAGE_DIMENSION_LIMIT square costs
+DEFAULT_IMAGE_TOKEN_BUDGET = IMAGE_DIMENSION_LIMIT * IMAGE_DIMENSION_LIMIT // PIXELS_PER_TOKEN
+# Captures taller than this height/width ratio are split into tiles of this ratio
+TILE_ASPECT_RATIO = 2.0
+TILE_OVERLAP = 0.05
+# All tiles of a screenshot are sent in one model call, which accepts at most 20
+# images; taller captures get proportionally taller tiles
+MAX_TILES = 20
+# Rows or columns within this tolerance of the background colour count as empty
+UNIFORM_TOLERANCE = 8
+# Runs of empty rows longer than this are collapsed to this many rows
+MAX_EMPTY_RUN = 48
+# Long side used for screenshots that are entirely background
+BLANK_IMAGE_DIMENSION = 128
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    return math.ceil(width * height / PIXELS_PER_TOKEN)
+
+
+def _background_lines(pixels: np.ndarray, background: int, axis: int) -> np.ndarray:
+    return (np.abs(pixels.astype(int) - background) <= UNIFORM_TOLERANCE).all(axis=axis)
+
+
+def trim_whitespace(image: Image.Image) -> Image.Image:
+    """Crop background-coloured borders and collapse long empty horizontal bands"""
+    pixels = np.asarray(image.convert('L'))
+    # The most common corner colour is taken as the page background
+    corners = [pixels[0, 0], pixels[0, -1], pixels[-1, 0], pixels[-1, -1]]
+    background = int(max(set(corners), key=corners.count))
+    empty_rows = _background_lines(pixels, background, axis=1)
+    empty_cols = _background_lines(pixels, background, axis=0)
+    if empty_rows.all():
+        # A blank screen carries no detail worth paying image tokens for
+        blank = image.copy()
+        blank.thumbnail((BLANK_IMAGE_DIMENSION, BLANK_IMAGE_DIMENSION))
+        return blank
+
+    top, bottom = np.argmax(~empty_rows), len(empty_rows) - np.argmax(~empty_rows[::-1])
+    left, right = np.argmax(~empty_cols), len(empty_cols) - np.argmax(~empty_cols[::-1])
+    image = image.crop((left, top, right, bottom))
+
+    # Keep at most MAX_EMPTY_RUN rows of every empty band inside the content
+    keep, run = [], 0
+    for row, empty in enumerate(empty_rows[top:bottom]):
+        run = run + 1 if empty else 0
+        if run <= MAX_EMPTY_RUN:
+            keep.append(row)
+    if len(keep) == image.height:
+        return image
+    return Image.fromarray(np.asarray(image)[keep])
+
+
+def split_tiles(image: Image.Image, max_tiles: int = MAX_TILES) -> List[Image.Image]:
+    """Split very tall captures into at most max_tiles overlapping tiles, of TILE_ASPECT_RATIO where possible"""
+    width, height = image.size
+    tile_height = int(width * TILE_ASPECT_RATIO)
+    if height <= tile_height or max_tiles <= 1:
+        return [image]
+    # max_tiles tiles of this height cover the capture, overlaps included
+    tile_height = max(tile_height, math.ceil(height / (1 + (max_tiles - 1) * (1 - TILE_OVERLAP))))
+    step = int(tile_height * (1 - TILE_OVERLAP))
+    # The step is rounded down, which can leave a sliver for one tile too many
+    while 1 + math.ceil((height - tile_height) / step) > max_tiles:
+        tile_height += 1
+        step = int(tile_height * (1 - TILE_OVERLAP))
+    tiles, top = [], 0
+    while True:
+        bottom = min(top + tile_height, height)
+        tiles.append(image.crop((0, top, width, bottom)))
+        if bottom >= height:
+            return tiles
+        top += step
+
+
+def floor_tokens(image: Image.Image) -> int:
+    """Tokens the image costs once downscaled no further than MIN_IMAGE_DIMENSION allows"""
+    width, height = image.size
+    scale = min(1.0, MIN_IMAGE_DIMENSION / max(width, height))
+    return estimate_image_tokens(max(1, int(width * scale)), max(1, int(height * scale)))
+
+
+def split_tiles_within_budget(image: Image.Image, token_budget: int) -> List[Image.Image]:
+    """
+    Tiles of a capture, reduced from MAX_TILES until every tile's even share of
+    token_budget keeps it at MIN_IMAGE_DIMENSION or above. Fewer tiles are
+    taller, so a larger share gives each a longer long side.
+    """
+    max_tiles = MAX_TILES
+    while True:
+        tiles = split_tiles(image, max_tiles)
+        share = max(1, token_budget // len(tiles))
+        if len(tiles) == 1 or all(floor_tokens(tile) <= share for tile in tiles):
+            return tiles
+        max_tiles = len(tiles) - 1
+
+
+def fit_to_budget(image: Image.Image, token_budget: int) -> Image.Image:
+    """Downscale so the image costs at most token_budget tokens and fits IMAGE_DIMENSION_LIMIT"""
+    width, height = image.size
+    long_side = max(width, height)
+    scale = min(1.0, IMAGE_DIMENSION_LIMIT / long_side,
+                math.sqrt(token_budget * PIXELS_PER_TOKEN / (width * height)))
+    scale = max(scale, min(1.0, MIN_IMAGE_DIMENSION / long_side))
+    if scale >= 1.0:
+        return image
+    return image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.Resampling.LANCZOS)
+
+
+def prepare_screenshot(image_path: str, token_budget: int = DEFAULT_IMAGE_TOKEN_BUDGET) -> Dict[str, Any]:
+    """
+    Run the image-budget stage for one screenshot.
+
+    Whitespace is trimmed, tall captures are tiled, and every tile is sized so the
+    screenshot as a whole stays within token_budget. Captures get fewer, taller
+    tiles when the budget cannot keep MAX_TILES of them at MIN_IMAGE_DIMENSION;
+    a single tile is never shrunk below it, even if that exceeds the budget,
+    which is then recorded as exceeded. Tiles are written as PNGs to the 'resized' folder next to the
+    screenshot; their paths and the estimated image-token cost are returned.
+    Tile names carry a digest of the screenshot's content and the budget, so
+    runs preparing different files of the same name never share tiles.
+    """
+    resized_dir = os.path.join(os.path.dirname(image_path), 'resized')
+    os.makedirs(resized_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    with open(image_path, 'rb') as image_file:
+        digest = hashlib.sha256(image_file.read() + str(token_budget).encode()).hexdigest()[:12]
+
+    with Image.open(image_path) as image:
+        original_size = image.size
+        image = image.convert('RGB')
+    trimmed = trim_whitespace(image)
+    tiles = split_tiles_within_budget(trimmed, token_budget)
+
+    tile_paths, estimated_tokens = [], 0
+    for index, tile in enumerate(tiles):
+        tile = fit_to_budget(tile, max(1, token_budget // len(tiles)))
+        tile_path = os.path.join(resized_dir, f"{stem}_{digest}_tile{index}.png")
+        # Write then rename: a run preparing the same screenshot may be reading this tile
+        tmp_path = f"{tile_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tile.save(tmp_path, format='PNG')
+        os.replace(tmp_path, tile_path)
+        tile_paths.append(tile_path)
+        estimated_tokens += estimate_image_tokens(*tile.size)
+
+    return {
+        'tile_paths': tile_paths,
+        'budget': {
+            'original_size': list(original_size),
+            'trimmed_size': list(trimmed.size),
+            'tiles': len(tiles),
+            'token_budget': token_budget,
+            'estimated_image_tokens': estimated_tokens,
+            'budget_exceeded': estimated_tokens > token_budget
+        }
+    }
@@ -0,0 +1,224 @@
+# image_prep.py
+import base64
+import hashlib
+import mimetypes
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+from PIL import Image
+from BedrockClient import IMAGE_DIMENSION_LIMIT
+from image_budget import prepare_screenshot, DEFAULT_IMAGE_TOKEN_BUDGET
+
+# Worker processes for image decoding, resizing and encoding (0 prepares on the
+# calling thread). Separate processes keep this CPU work off the GIL that the
+# request threads and Bedrock calls share.
+IMAGE_PREP_WORKERS = int(os.environ.get('IMAGE_PREP_WORKERS', os.cpu_count() or 1))
+# Screenshots of one run prepared ahead of the one being analysed
+IMAGE_PREP_LOOKAHEAD = int(os.environ.get('IMAGE_PREP_LOOKAHEAD', max(2, IMAGE_PREP_WORKERS)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the process-wide image preparation pool, or None when disabled"""
+    global _pool
+    if IMAGE_PREP_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Never fork: the server process already runs threads (request handlers,
+            # Bedrock connection pools, background services), and a forked child can
+            # inherit a lock one of them held. Workers start from a fresh interpreter
+            # instead; the app's modules have no import-time side effects to rerun.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_PREP_WORKERS, mp_context=context)
+        return _pool
+
+
+def encode_data_url(image_path: str) -> str:
+    """Image file as a base64 data URL, as embedded in analysis results and reports"""
+    with open(image_path, 'rb') as image_file:
+        image_data = image_file.read()
+    mime_type, _ = mimetypes.guess_type(image_path)
+    if not mime_type or not mime_type.startswith('image'):
+        mime_type = 'image/png'
+    return f"data:{mime_type};base64,{base64.b64encode(image_data).decode('utf-8')}"
+
+
+def prepare_triage_image(image_path: str) -> str:
+    """Resize a screenshot for the triage model the way BedrockClient.encode_image does, as a PNG"""
+    resized_dir = os.path.join(os.path.dirname(image_path), 'resized')
+    os.makedirs(resized_dir, exist_ok=True)
+    with open(image_path, 'rb') as image_file:
+        digest = hashlib.sha256(image_file.read()).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    triage_path = os.path.join(resized_dir, f"{stem}_{digest}_triage.png")
+    with Image.open(image_path) as image:
+        image.thumbnail((IMAGE_DIMENSION_LIMIT, IMAGE_DIMENSION_LIMIT), Image.Resampling.LANCZOS)
+        # Write then rename, as for the image-budget tiles
+        tmp_path = f"{triage_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, format='PNG')
+        os.replace(tmp_path, triage_path)
+    return triage_path
+
+
+def prepare_image(image_path: str, token_budget: int = DEFAULT_IMAGE_TOKEN_BUDGET, triage: bool = False) -> Dict[str, Any]:
+    """
+    All CPU-bound image work a screenshot needs before its first model call: the
+    base64 copy for the results and report, plus the image-budget tiles or, for
+    the cascade (triage=True), only the triage-model image. Tiles of a triaged
+    screenshot are prepared by prepare_tiles once it is escalated.
+    Runs in a pool worker; returns picklable results with its own timing.
+    """
+    started = time.time()
+    prepared = {
+        'image_path': image_path,
+        **(prepare_screenshot(image_path, token_budget) if not triage else {}),
+        'screenshot_base64': encode_data_url(image_path),
+        'triage_path': prepare_triage_image(image_path) if triage else None
+    }
+    prepared['timing'] = {'started': started, 'finished': time.time()}
+    return prepared
+
+
+def prepare_tiles(image_path: str, token_budget: int = DEFAULT_IMAGE_TOKEN_BUDGET) -> Dict[str, Any]:
+    """The image-budget tiles of a screenshot, with their timing; runs in a pool worker"""
+    started = time.time()
+    prepared = prepare_screenshot(image_path, token_budget)
+    prepared['timing'] = {'started': started, 'finished': time.time()}
+    return prepared
+
+
+class StageStats:
+    """Items, busy time and wall-clock span of one pipeline stage in a run"""
+
+    def __init__(self):
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.first_started: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, started: float, finished: float, wait_seconds: float = 0.0, items: int = 1) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_seconds += finished - started
+            self.wait_seconds += wait_seconds
+            self.first_started = started if self.first_started is None else min(self.first_started, started)
+            self.last_finished = finished if self.last_finished is None else max(self.last_finished, finished)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            wall = round(self.last_finished - self.first_started, 3) if self.items else 0.0
+            return {
+                'items': self.items,
+                'busy_seconds': round(self.busy_seconds, 3),
+                'wall_seconds': wall,
+                'items_per_second': round(self.items / wall, 2) if wall > 0 else None,
+                # Time the analysis waited on this stage, i.e. its share of the critical path
+                'wait_seconds': round(self.wait_seconds, 3)
+            }
+
+
+class ImagePrepStage:
+    """
+    Prepares a run's screenshots in the process pool ahead of their analysis.
+
+    Up to `lookahead` screenshots are in preparation at once. Each get() returns
+    a screenshot's prepared images, waiting only if the pool has not finished
+    them yet; done() frees its slot for the next screenshot, so while one
+    screenshot's model calls are in flight the following ones are prepared.
+
+    With triage=True (cascade mode) screenshots are prepared for triage only,
+    and get(tiles=True) prepares the tiles of those that are escalated, so
+    screens the cascade skips never pay for tiling.
+    """
+
+    def __init__(self, image_paths: List[str], token_budget: int, triage: bool = False,
+                 lookahead: int = IMAGE_PREP_LOOKAHEAD, stats: Optional[StageStats] = None):
+        self.token_budget = token_budget
+        self.triage = triage
+        self.lookahead = max(1, lookahead)
+        self.stats = stats or StageStats()
+        self._pending = list(image_paths)
+        self._futures: Dict[str, Future] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._fill()
+
+    def _fill(self) -> None:
+        pool = get_process_pool()
+        if pool is None:
+            return
+        with self._lock:
+            while self._pending and len(self._futures) < self.lookahead:
+                image_path = self._pending.pop(0)
+                self._futures[image_path] = pool.submit(prepare_image, image_path, self.token_budget, self.triage)
+
+    def get(self, image_path: str, tiles: bool = False) -> Dict[str, Any]:
+        """A screenshot's prepared images; tiles=True also makes sure its tiles are prepared"""
+        prepared = self._prepared(image_path)
+        if tiles and 'tile_paths' not in prepared:
+            pool = get_process_pool()
+            waited = time.time()
+            if pool is None:
+                tiled = prepare_tiles(image_path, self.token_budget)
+            else:
+                tiled = pool.submit(prepare_tiles, image_path, self.token_budget).result()
+            waited = time.time() - waited
+            # Same screenshot, so not another item of the stage
+            self.stats.record(tiled['timing']['started'], tiled['timing']['finished'], waited, items=0)
+            prepared = {**prepared, **tiled, 'timing': prepared['timing']}
+            with self._lock:
+                self._results[image_path] = prepared
+        return prepared
+
+    def _prepared(self, image_path: str) -> Dict[str, Any]:
+        with self._lock:
+            if image_path in self._results:
+                # Triage and full analysis of a screenshot share one preparation
+                return self._results[image_path]
+            future = self._futures.get(image_path)
+            if future is None and image_path in self._pending:
+                # Asked for out of order (concurrent analysis): start it now
+                self._pending.remove(image_path)
+                pool = get_process_pool()
+                if pool is not None:
+                    future = self._futures[image_path] = pool.submit(
+                        prepare_image, image_path, self.token_budget, self.triage)
+        waited = time.time()
+        if future is None:
+            prepared = prepare_image(image_path, self.token_budget, self.triage)
+        else:
+            prepared = future.result()
+        waited = time.time() - waited
+        self.stats.record(prepared['timing']['started'], prepared['timing']['finished'], waited)
+        with self._lock:
+            self._results[image_path] = prepared
+        return prepared
+
+    def done(self, image_path: str) -> None:
+        """Release a screenshot's slot, whether or not its prepared images were used"""
+        with self._lock:
+            future = self._futures.pop(image_path, None)
+            self._results.pop(image_path, None)
+            if image_path in self._pending:
+                self._pending.remove(image_path)
+        if future is not None:
+            future.cancel()
+        self._fill()
+
+    def close(self) -> None:
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+            self._results.clear()
+            self._pending.clear()
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,250 @@
+# pdf_generator_native.py
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, KeepTogether
+from PIL import Image as PILImage
+from datetime import datetime
+from xml.sax.saxutils import escape
+from typing import List, Dict, Any, Iterable, Optional
+import asyncio
+import base64
+import os
+import tempfile
+from pdf_generator_v2 import ModernPDFGenerator
+
+# Mirrors the page margin plus the .container padding of report_template.html
+PAGE_MARGIN = 0.4 * inch + 15
+# Screenshots are capped at the template's max-height of 400px
+SCREENSHOT_MAX_HEIGHT = 300
+LOGO_WIDTH = 75
+# Screenshots are embedded at twice their displayed size (144 dpi) rather than at
+# full resolution, which keeps text legible and the PDF small and fast to write
+IMAGE_SCALE = 2
+
+# Colours of report_template.html
+TEXT = colors.HexColor('#1E293B')
+TITLE = colors.HexColor('#0F172A')
+MUTED = colors.HexColor('#64748B')
+LABEL = colors.HexColor('#475569')
+CONTENT = colors.HexColor('#334155')
+BORDER = colors.HexColor('#E2E8F0')
+PANEL = colors.HexColor('#F8FAFC')
+SKIPPED = colors.HexColor('#B45309')
+FACET_BADGE = ('#E0F2FE', '#0369A1', '#BAE6FD')
+ISSUE_LABELS = [
+    ('Location', 'location', '#475569'),
+    ('Inclusivity Bug Category', 'categories', '#DC2626'),
+    ('Bug Description', 'description', '#e26834'),
+    ('Potential Fixes (Recommendation)', 'recommendation', '#65A30D'),
+]
+
+
+def _text(value: Any) -> str:
+    return escape(str(value if value is not None else ''))
+
+
+class NativePDFGenerator(ModernPDFGenerator):
+    """
+    Renders the report of report_template.html with ReportLab instead of Chromium.
+
+    Same sections and colours as the HTML report; the page
+    layout is drawn directly, so no browser process is started.
+    """
+
+    def __init__(self, output_path: str):
+        super().__init__(output_path)
+        self._scratch_dir = None
+        self.styles = {
+            'title': ParagraphStyle('Title', fontName='Helvetica-Bold', fontSize=24, leading=29, textColor=TITLE),
+            'date': ParagraphStyle('Date', fontName='Helvetica', fontSize=14, leading=18, textColor=MUTED),
+            'screenshot_title': ParagraphStyle('ScreenshotTitle', fontName='Helvetica-Bold', fontSize=16, leading=20,
+                                               textColor=CONTENT),
+            'note': ParagraphStyle('Note', fontName='Helvetica', fontSize=12, leading=15, textColor=MUTED),
+            'skipped': ParagraphStyle('Skipped', fontName='Helvetica', fontSize=12, leading=15, textColor=SKIPPED,
+                                      alignment=1),
+            'rule_title': ParagraphStyle('RuleTitle', fontName='Helvetica-Bold', fontSize=14, leading=18, textColor=TITLE),
+            'badge': ParagraphStyle('Badge', fontName='Helvetica', fontSize=11, leading=13, alignment=1),
+            'label': ParagraphStyle('Label', fontName='Helvetica-Bold', fontSize=12, leading=15, textColor=LABEL),
+            'content': ParagraphStyle('Content', fontName='Helvetica', fontSize=12, leading=18, textColor=CONTENT),
+        }
+
+    def _badge(self, text: str, bg_color: str, text_color: str, border_color: str, max_width: float = 200) -> Table:
+        style = ParagraphStyle('BadgeText', parent=self.styles['badge'], textColor=colors.HexColor(text_color))
+        # Sized to its text like the template's inline badges
+        text_width = stringWidth(str(text), style.fontName, style.fontSize) + 2
+        badge = Table([[Paragraph(_text(text), style)]], colWidths=[min(text_width, max_width) + 16], hAlign='LEFT')
+        badge.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor(bg_color)),
+            ('BOX', (0, 0), (-1, -1), 0.75, colors.HexColor(border_color)),
+            ('ROUNDEDCORNERS', [8, 8, 8, 8]),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+        ]))
+        return badge
+
+    def _image(self, image_path: str, max_width: float, max_height: float) -> Image:
+        with PILImage.open(image_path) as image:
+            width, height = image.size
+            scale = min(max_width / width, max_height / height, 1)
+            display = (width * scale, height * scale)
+            if self._scratch_dir and scale * IMAGE_SCALE < 0.9:
+                # Downscaled copies go to disk; ReportLab loads each image only when drawing it
+                image.thumbnail((round(display[0] * IMAGE_SCALE), round(display[1] * IMAGE_SCALE)))
+                image_path = os.path.join(self._scratch_dir, f"{len(os.listdir(self._scratch_dir))}.png")
+                image.save(image_path)
+        return Image(image_path, width=display[0], height=display[1])
+
+    def _screenshot_file(self, result: Dict[str, Any]) -> Optional[str]:
+        """The screenshot to draw: its file, or its base64 copy once the upload is gone"""
+        screenshot_path = result.get('screenshot_path')
+        if screenshot_path and os.path.exists(screenshot_path):
+            return screenshot_path
+        data_url = result.get('screenshot_base64') or ''
+        if not (self._scratch_dir and data_url.startswith('data:') and ',' in data_url):
+            return None
+        image_path = os.path.join(self._scratch_dir, f"{len(os.listdir(self._scratch_dir))}.img")
+        with open(image_path, 'wb') as image_file:
+            image_file.write(base64.b64decode(data_url.split(',', 1)[1]))
+        return image_path
+
+    def _header(self, width: float) -> Table:
+        title = [Paragraph('Inclusivity Bug Report', self.styles['title']),
+                 Paragraph(datetime.now().strftime("%B %d, %Y"), self.styles['date'])]
+        logo_path = os.path.abspath('logo.png')
+        logo = self._image(logo_path, LOGO_WIDTH, LOGO_WIDTH * 2) if os.path.exists(logo_path) else ''
+        header = Table([[title, logo]], colWidths=[width - LOGO_WIDTH - 15, LOGO_WIDTH + 15])
+        header.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('LINEBELOW', (0, 0), (-1, 0), 1.5, BORDER),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ]))
+        return header
+
+    def _screenshot_section(self, result: Dict[str, Any], width: float) -> Table:
+        inner_width = width - 24
+        rows = [[Paragraph(f"Screenshot - {_text(self._format_screenshot_name(result.get('screenshot', '')))}",
+                           self.styles['screenshot_title'])]]
+        if result.get('video'):
+            rows.append([Paragraph(f"Recording {_text(result['video'].get('source'))} at "
+                                   f"{_text(result['video'].get('timestamp_label'))}", self.styles['note'])])
+
+        content = []
+        if result.get('skipped'):
+            content.append(Paragraph(f"Not analysed: {_text(result['skipped'])}", self.styles['skipped']))
+        screenshot_file = self._screenshot_file(result)
+        if screenshot_file:
+            content.append(self._image(screenshot_file, inner_width - 24, SCREENSHOT_MAX_HEIGHT))
+        if content:
+            box = Table([[content]], colWidths=[inner_width])
+            box.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+                ('BOX', (0, 0), (-1, -1), 0.75, BORDER),
+                ('ROUNDEDCORNERS', [6, 6, 6, 6]),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('TOPPADDING', (0, 0), (-1, -1), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ]))
+            rows.append([box])
+
+        section = Table(rows, colWidths=[width])
+        section.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), PANEL),
+            ('ROUNDEDCORNERS', [9, 9, 9, 9]),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, -1), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -2), 6),
+        ]))
+        return section
+
+    def _issue_rows(self, bug: Dict[str, Any], width: float) -> List[List[Any]]:
+        """One card row per field, so long rule cards can break between fields"""
+        rows = []
+        for label, key, color in ISSUE_LABELS:
+            content = Table([[Paragraph(_text(bug.get(key)), self.styles['content'])]], colWidths=[width])
+            content.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), PANEL),
+                ('ROUNDEDCORNERS', [6, 6, 6, 6]),
+                ('LEFTPADDING', (0, 0), (-1, -1), 6),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+                ('TOPPADDING', (0, 0), (-1, -1), 6),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ]))
+            label_style = ParagraphStyle('IssueLabel', parent=self.styles['label'], textColor=colors.HexColor(color))
+            rows.append([[Paragraph(label, label_style), Spacer(1, 3), content]])
+        return rows
+
+    def _rule_card(self, rule: Dict[str, Any], violation: Dict[str, Any], width: float) -> Table:
+        inner_width = width - 24
+        facet = rule.get('Facet')
+        header = Table([[Paragraph(_text(rule.get('Rule Name', violation.get('rule_id'))), self.styles['rule_title']),
+                         self._badge(facet, *FACET_BADGE, max_width=inner_width * 0.4 - 16) if facet else '']],
+                       colWidths=[inner_width * 0.6, inner_width * 0.4])
+        header.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ]))
+        rows = [[header]]
+        style = [
+            ('BOX', (0, 0), (-1, -1), 0.75, BORDER),
+            ('ROUNDEDCORNERS', [9, 9, 9, 9]),
+            ('BACKGROUND', (0, 0), (-1, 0), PANEL),
+            ('LINEBELOW', (0, 0), (-1, 0), 0.75, BORDER),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ]
+        bugs = violation.get('bugs', [])
+        for index, bug in enumerate(bugs):
+            first = len(rows)
+            rows += self._issue_rows(bug, inner_width)
+            last = len(rows) - 1
+            style += [
+                ('TOPPADDING', (0, first), (-1, first), 12),
+                ('BOTTOMPADDING', (0, last), (-1, last), 12),
+            ]
+            if index < len(bugs) - 1:
+                # Separator between issues, like .issue-group's bottom border
+                style.append(('LINEBELOW', (0, last), (-1, last), 0.75, BORDER))
+        card = Table(rows, colWidths=[width])
+        card.setStyle(TableStyle(style))
+        return card
+
+    def build_story(self, rules: List[Dict[str, Any]], analysis_results: Iterable[Dict[str, Any]], width: float) -> List[Any]:
+        rule_lookup = {rule.get('Rule ID'): rule for rule in rules}
+        story = [self._header(width), Spacer(1, 24)]
+        for result in analysis_results:
+            story += [KeepTogether(self._screenshot_section(result, width)), Spacer(1, 18)]
+            for violation in result.get('violations', []):
+                # Long cards split across pages like the HTML report's rule cards
+                story += [self._rule_card(rule_lookup.get(violation.get('rule_id'), {}), violation, width), Spacer(1, 18)]
+        return story
+
+    def generate_report(self, rules: List[Dict[str, Any]], analysis_results: Iterable[Dict[str, Any]]):
+        doc = SimpleDocTemplate(self.output_path, pagesize=A4, leftMargin=PAGE_MARGIN, rightMargin=PAGE_MARGIN,
+                                topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN, title='Inclusivity Bug Report')
+        with tempfile.TemporaryDirectory(prefix='report_images_') as scratch_dir:
+            self._scratch_dir = scratch_dir
+            try:
+                doc.build(self.build_story(rules, analysis_results, doc.width))
+            finally:
+                self._scratch_dir = None
+
+    async def generate_report_async(self, rules: List[Dict[str, Any]], analysis_results: Iterable[Dict[str, Any]]):
+        # Layout is CPU-bound and needs no browser, so it simply runs off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.generate_report, rules, analysis_results)
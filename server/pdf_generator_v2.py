@@ -1,12 +1,35 @@
 # pdf_generator_v2.py
 from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 from jinja2 import Environment, FileSystemLoader
 from datetime import datetime
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 import re
 import tempfile
 import base64
+import asyncio
+
+PDF_MARGIN = {
+    'top': '0.4in',
+    'right': '0.4in',
+    'bottom': '0.4in',
+    'left': '0.4in'
+}
+# Report renderer: 'chromium' prints report_template.html through Playwright,
+# 'reportlab' draws the same report natively without a browser
+PDF_BACKEND = os.environ.get('PDF_BACKEND', 'chromium')
+PDF_BACKENDS = ('chromium', 'reportlab')
+# Headless browsers rendering at once on the async serving path
+PDF_RENDER_CONCURRENCY = int(os.environ.get('PDF_RENDER_CONCURRENCY', 2))
+_render_semaphore = None
+
+def _get_render_semaphore() -> asyncio.Semaphore:
+    # Created lazily so it binds to the running event loop
+    global _render_semaphore
+    if _render_semaphore is None:
+        _render_semaphore = asyncio.Semaphore(PDF_RENDER_CONCURRENCY)
+    return _render_semaphore
 
 class ModernPDFGenerator:
     def __init__(self, output_path: str):
@@ -51,49 +74,83 @@ class ModernPDFGenerator:
             print(f"Error encoding image {image_path}: {str(e)}")
             return ""
 
-    def generate_report(self, rules: List[Dict[str, Any]], analysis_results: List[Dict[str, Any]]):
+    def _with_screenshots(self, analysis_results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        # Attach base64 screenshots one result at a time, reusing any the analysis already carries
+        for result in analysis_results:
+            if not result.get('screenshot_base64') and 'screenshot_path' in result:
+                result = {**result, 'screenshot_base64': self._encode_image_to_base64(result['screenshot_path'])}
+            yield result
+
+    def render_html(self, rules: List[Dict[str, Any]], analysis_results: Iterable[Dict[str, Any]]) -> str:
         # Get absolute path for logo
         logo_path = os.path.abspath('logo.png')
         logo_base64 = self._encode_image_to_base64(logo_path) if os.path.exists(logo_path) else ""
 
-        # Convert screenshot paths to base64
-        for result in analysis_results:
-            if 'screenshot_path' in result:
-                result['screenshot_base64'] = self._encode_image_to_base64(result['screenshot_path'])
-        
         template = self.env.get_template('report_template.html')
         template_data = {
             'date': datetime.now().strftime("%B %d, %Y"),
             'rules': rules,
-            'results': analysis_results,
+            'results': self._with_screenshots(analysis_results),
             'format_name': self._format_screenshot_name,
             'get_severity_styles': self._get_severity_styles,
             'logo_base64': logo_base64
         }
         
-        html_content = template.render(**template_data)
+        # Stream the template section by section into the file instead of building one string
         with tempfile.NamedTemporaryFile(suffix='.html', mode='w', delete=False) as f:
-            f.write(html_content)
-            temp_html_path = f.name
+            for chunk in template.generate(**template_data):
+                f.write(chunk)
+            return f.name
 
+    def generate_report(self, rules: List[Dict[str, Any]], analysis_results: Iterable[Dict[str, Any]]):
+        temp_html_path = self.render_html(rules, analysis_results)
         try:
             with sync_playwright() as p:
                 browser = p.chromium.launch()
                 page = browser.new_page()
                 page.goto(f'file://{temp_html_path}')
                 page.wait_for_load_state('networkidle')
-                page.pdf(path=self.output_path, format='A4', print_background=True, margin={
-                    'top': '0.4in',
-                    'right': '0.4in',
-                    'bottom': '0.4in',
-                    'left': '0.4in'
-                })
+                page.pdf(path=self.output_path, format='A4', print_background=True, margin=PDF_MARGIN)
                 browser.close()
         finally:
             os.unlink(temp_html_path)
 
+    async def generate_report_async(self, rules: List[Dict[str, Any]], analysis_results: Iterable[Dict[str, Any]]):
+        # Template rendering reads every screenshot from disk, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        temp_html_path = await loop.run_in_executor(None, self.render_html, rules, analysis_results)
+        try:
+            # Each Chromium instance is large; cap how many render at once
+            async with _get_render_semaphore():
+                async with async_playwright() as p:
+                    browser = await p.chromium.launch()
+                    page = await browser.new_page()
+                    await page.goto(f'file://{temp_html_path}')
+                    await page.wait_for_load_state('networkidle')
+                    await page.pdf(path=self.output_path, format='A4', print_background=True, margin=PDF_MARGIN)
+                    await browser.close()
+        finally:
+            os.unlink(temp_html_path)
+
+def get_report_generator(output_path: str, backend: str = PDF_BACKEND) -> ModernPDFGenerator:
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend {backend!r}, expected one of {PDF_BACKENDS}")
+    if backend == 'reportlab':
+        # Imported here because the native generator builds on ModernPDFGenerator
+        from pdf_generator_native import NativePDFGenerator
+        return NativePDFGenerator(output_path)
+    return ModernPDFGenerator(output_path)
+
 def generate_inclusivity_report(rules: List[Dict[str, Any]], 
-                              analysis_results: List[Dict[str, Any]], 
-                              output_path: str):
-    generator = ModernPDFGenerator(output_path)
-    generator.generate_report(rules, analysis_results)
\ No newline at end of file
+                              analysis_results: Iterable[Dict[str, Any]], 
+                              output_path: str,
+                              backend: str = PDF_BACKEND):
+    generator = get_report_generator(output_path, backend)
+    generator.generate_report(rules, analysis_results)
+
+async def generate_inclusivity_report_async(rules: List[Dict[str, Any]], 
+                                            analysis_results: Iterable[Dict[str, Any]], 
+                                            output_path: str,
+                                            backend: str = PDF_BACKEND):
+    generator = get_report_generator(output_path, backend)
+    await generator.generate_report_async(rules, analysis_results)
\ No newline at end of file
@@ -1,24 +1,33 @@
 import pandas as pd
-from BedrockClient import BedrockClient
+from BedrockClient import get_bedrock_client, TRIAGE_MODEL_ID, CHARS_PER_TOKEN
+from TokenScheduler import RequestBudget, BudgetExceeded
+from BedrockCassette import CassetteMiss
 import json
-import base64
-import mimetypes
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterable
 from pdf_generator_v2 import generate_inclusivity_report
+from pdf_generator_native import NativePDFGenerator
 from CacheClient import CacheClient, create_hash
+from FindingsStore import FindingsStore, file_digest, DEFAULT_TENANT
+from ResultSpool import ResultSpool
+from StorageManager import acquire_paths, release_paths
+from video_keyframes import extract_keyframes, format_timestamp, VIDEO_EXTENSIONS
+from image_budget import DEFAULT_IMAGE_TOKEN_BUDGET
+from image_prep import ImagePrepStage, StageStats, prepare_image, encode_data_url
 import time
+import re
 
 class InclusivityPipeline:
-    def __init__(self):
-        self.bedrock_client = BedrockClient()
+    def __init__(self, cascade: bool = False, findings_store: Optional[FindingsStore] = None,
+                 budget: Optional[RequestBudget] = None):
+        self.bedrock_client = get_bedrock_client()
+        # Every model call of this pipeline is scheduled and charged against one budget
+        self.budget = budget or RequestBudget()
+        self.findings_store = findings_store
+        self.cascade = cascade
+        self.triage_client = get_bedrock_client(TRIAGE_MODEL_ID) if cascade else None
+        self.start_run()
         self.cache_client = CacheClient()
-        self.styles = getSampleStyleSheet()
         
     def read_decision_rules(self, csv_path: str, persona) -> List[Dict[str, Any]]:
         csv_path = os.path.join(f"{persona.upper()}_{csv_path}")
@@ -33,20 +42,8 @@ class InclusivityPipeline:
     def encode_image_to_base64(self, image_path: str) -> str:
         """Convert image file to base64 string"""
         try:
-            with open(image_path, 'rb') as image_file:
-                # Read the image data
-                image_data = image_file.read()
-                
-                # Get the MIME type
-                mime_type, _ = mimetypes.guess_type(image_path)
-                if not mime_type or not mime_type.startswith('image'):
-                    mime_type = 'image/png'  # Default fallback
-                
-                # Encode to base64
-                base64_string = base64.b64encode(image_data).decode('utf-8')
-                
-                # Return data URL format
-                return f"data:{mime_type};base64,{base64_string}"
+            # Data URL format, as the preparation stage produces it
+            return encode_data_url(image_path)
                 
         except Exception as e:
             print(f"Error encoding image {image_path}: {str(e)}")
@@ -81,17 +78,27 @@ class InclusivityPipeline:
             return self.get_tim_description()
         return self.get_abi_description()
 
+    def rules_cache_key(self, rules: List[Dict[str, Any]]) -> str:
+        """Cache key of the rules analysis for a set of decision rules"""
+        return create_hash(*[
+            (rule.get('Rule Name', ''), rule.get('Description', ''), rule.get('Facet', ''), rule.get('Bug_Categories', ''))
+            for rule in rules
+        ])
+
+    def validate_rules_analysis(self, rules: List[Dict[str, Any]], analysis: Any) -> None:
+        """Raise if the rules analysis does not cover every decision rule"""
+        entries = analysis.get('rules') if isinstance(analysis, dict) else analysis
+        if not isinstance(entries, list):
+            raise Exception("Rules analysis is not a list of rules")
+        analysed_ids = {entry.get('rule_id') for entry in entries if isinstance(entry, dict)}
+        missing = [rule.get('Rule ID') for rule in rules if rule.get('Rule ID') not in analysed_ids]
+        if missing:
+            raise Exception(f"Rules analysis is missing rules: {missing}")
+
     def generate_rules_analysis(self, rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate comprehensive analysis for all rules at once"""
         try:
-            rules_hash = create_hash(*[
-                (rule.get('Rule Name', ''), rule.get('Description', ''), rule.get('Facet', ''), rule.get('Bug_Categories', ''))
-                for rule in rules
-            ])
-            cached_analysis = self.cache_client.get_cached_data(rules_hash, 'rules_analysis')
-            if cached_analysis:
-                return cached_analysis
-
+            rules_hash = self.rules_cache_key(rules)
             prompt = f"""
             Analyze these inclusivity decision rules:
             Rules: {rules}
@@ -113,12 +120,17 @@ class InclusivityPipeline:
                 impact: user experience impact
             }}
             """
-            response = self.bedrock_client.call_claude(
-                prompt=prompt,
-                image_paths=[]  # No images for rule analysis
-            )
-            analysis = json.loads(response['response'])
-            self.cache_client.set_cached_data(rules_hash, analysis, 'rules_analysis')
+
+            def compute_rules_analysis():
+                response = self.bedrock_client.call_claude(
+                    prompt=prompt,
+                    image_paths=[],  # No images for rule analysis
+                    budget=self.budget
+                )
+                return json.loads(response['response'])
+
+            # Concurrent requests for the same rules wait on a single model call
+            analysis = self.cache_client.get_or_compute(rules_hash, compute_rules_analysis, 'rules_analysis')
 
 
             '''
@@ -142,22 +154,15 @@ class InclusivityPipeline:
             '''
             return analysis
 
+        except CassetteMiss:
+            raise
         except Exception as e:
             raise Exception(f"Error generating rules analysis: {str(e)}")
 
-    def analyze_screenshot(self, 
-                         persona: str,   
-                         image_path: str, 
-                         rules_analysis: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analyze a screenshot for inclusivity bugs based on all rules"""
-        try:
-            # Extract just the filename from the path
-            #image_filename = os.path.basename(image_path)
-            image_filename = os.path.abspath(image_path)
-            image_filename = image_filename.replace('\u202f', ' ')
-            persona_description = self.get_facet_description(persona)
-            
-            prompt = f"""  
+    def screenshot_prompt(self, persona: str, rules_analysis: Any) -> str:
+        """Prompt for the full-model analysis of one screenshot"""
+        persona_description = self.get_facet_description(persona)
+        return f"""  
             {persona_description}
                       
             Analyze this screenshot for inclusivity bugs based on these rules:
@@ -190,117 +195,407 @@ class InclusivityPipeline:
                 ]
             }}
             """
-            cache_key = create_hash(prompt, image_path)
-            cached_analysis = self.cache_client.get_cached_data(cache_key, 'screenshot_analysis')
-            
-            if cached_analysis:
-                print(f"If cache block in analyze function: {image_filename}")
-                return cached_analysis
 
-            response = self.bedrock_client.call_claude(
-                prompt=prompt,
-                image_paths=[image_filename]
-            )
-            analysis = json.loads(response['response'])
-            analysis['screenshot_name'] = image_filename
-            analysis['screenshot_path'] = image_path
-            analysis['screenshot_base64']= self.encode_image_to_base64(image_path)
+    def analysis_cache_key(self, persona: str, image_path: str, rules_analysis: Any, image_token_budget: int) -> str:
+        return create_hash(self.screenshot_prompt(persona, rules_analysis), self.image_digest(image_path), image_token_budget)
+
+    def image_digest(self, image_path: str) -> str:
+        """
+        Content digest of a screenshot, the identity its analyses are cached under.
+        Every request uploads into its own folder, so paths differ between uploads
+        of the same image while the same path never holds a different image.
+        """
+        if image_path not in self.image_digests:
+            self.image_digests[image_path] = file_digest(image_path)
+        return self.image_digests[image_path]
 
-            self.cache_client.set_cached_data(cache_key, analysis, 'screenshot_analysis')
+    def analyze_screenshot(self, 
+                         persona: str,   
+                         image_path: str, 
+                         rules_analysis: List[Dict[str, Any]],
+                         image_token_budget: int = DEFAULT_IMAGE_TOKEN_BUDGET,
+                         prep_stage: Optional[ImagePrepStage] = None) -> Dict[str, Any]:
+        """Analyze a screenshot for inclusivity bugs based on all rules"""
+        try:
+            # Extract just the filename from the path
+            #image_filename = os.path.basename(image_path)
+            image_filename = os.path.abspath(image_path)
+            image_filename = image_filename.replace('\u202f', ' ')
+            prompt = self.screenshot_prompt(persona, rules_analysis)
+            cache_key = self.analysis_cache_key(persona, image_path, rules_analysis, image_token_budget)
+            computed = []
+
+            def compute_analysis():
+                computed.append(True)
+                # Trimmed, tiled and sized to the screenshot's share of the request's token
+                # budget, normally ahead of time by the preparation stage
+                prepared = self.prepared_image(image_path, image_token_budget, prep_stage)
+                tile_paths = prepared['tile_paths']
+                # Every tile goes in one message so the rules prompt is sent once per screenshot
+                tile_prompt = prompt if len(tile_paths) == 1 else (
+                    f"{prompt}\n            The {len(tile_paths)} images are consecutive sections of one tall scrolling "
+                    f"screenshot, from top to bottom, with a small overlap. Report each issue once and give "
+                    f"its section number in the location."
+                )
+                response = self.bedrock_client.call_claude(prompt=tile_prompt, image_paths=tile_paths, prepared=True,
+                                                           budget=self.budget)
+                analysis = json.loads(response['response'])
+
+                input_tokens = response['metadata'].get('input_tokens') or 0
+                analysis['screenshot_name'] = image_filename
+                analysis['screenshot_path'] = image_path
+                analysis['screenshot_base64']= prepared['screenshot_base64']
+                analysis['model_metadata'] = {
+                    'input_tokens': input_tokens,
+                    'output_tokens': response['metadata'].get('output_tokens') or 0,
+                    'latency': response['metadata'].get('latency') or 0,
+                    'model_id': self.bedrock_client.MODEL_ID
+                }
+                # Bedrock reports input tokens for the whole message only. The image share is
+                # inferred by subtracting an estimate of the prompt's tokens, so it is not a count.
+                estimated_text_tokens = len(tile_prompt) // CHARS_PER_TOKEN
+                analysis['image_budget'] = {
+                    **prepared['budget'],
+                    'actual_input_tokens': input_tokens,
+                    'estimated_text_tokens': estimated_text_tokens,
+                    'inferred_image_tokens': max(0, input_tokens - estimated_text_tokens)
+                }
+                return analysis
+
+            # Identical uploads in flight at the same time share one model call
+            analysis = self.cache_client.get_or_compute(cache_key, compute_analysis, 'screenshot_analysis')
+            # The cache is keyed by image content, so an analysis computed for an earlier
+            # upload names that upload's (since deleted) file; point it at this one
+            analysis = {**analysis, 'screenshot_name': image_filename, 'screenshot_path': image_path}
+            # Cached analyses (or ones another caller computed) made no model call in this run
+            analysis['cached'] = not computed
             return analysis
             
             
+        except (BudgetExceeded, CassetteMiss):
+            raise
         except Exception as e:
             raise Exception(f"Error analyzing screenshot {image_filename}: {str(e)}")
 
+    def triage_screenshot(self,
+                          persona: str,
+                          image_path: str,
+                          rules: List[Dict[str, Any]],
+                          prep_stage: Optional[ImagePrepStage] = None) -> Dict[str, Any]:
+        """Pre-screen a screenshot with the fast model to decide what needs the full model"""
+        rule_ids = [str(rule.get('Rule ID', '')) for rule in rules]
+        prompt = f"""
+            {self.get_facet_description(persona)}
+
+            Quickly screen this screenshot before a detailed inclusivity review.
+            These are the decision rules:
+            {[{'rule_id': rule.get('Rule ID', ''), 'rule': rule.get('Rule Name', '')} for rule in rules]}
+
+            Decide:
+            - trivial: true if the screen has no meaningful UI to review (blank, loading spinner, splash screen), otherwise false
+            - applicable_rules: IDs of the rules whose UI elements appear on this screen and could be violated
+
+            Return only a JSON object: {{"trivial": false, "applicable_rules": ["DR1"]}}
+            """
+        cache_key = create_hash(prompt, self.image_digest(image_path), self.triage_client.MODEL_ID)
+        computed = []
+
+        def compute_triage():
+            computed.append(True)
+            if prep_stage is not None:
+                # Resized ahead of time by the preparation stage
+                image_paths, prepared = [prep_stage.get(image_path)['triage_path']], True
+            else:
+                image_paths, prepared = [self.bedrock_client.normalize_path(os.path.abspath(image_path))], False
+            response = self.triage_client.call_claude(
+                prompt=prompt,
+                image_paths=image_paths,
+                max_tokens=512,
+                prepared=prepared,
+                budget=self.budget
+            )
+            match = re.search(r'\{.*\}', response['response'], re.DOTALL)
+            verdict = json.loads(match.group(0))
+            trivial = verdict.get('trivial') is True
+            applicable = [rule_id for rule_id in verdict.get('applicable_rules', []) if rule_id in rule_ids]
+            return {
+                'trivial': trivial,
+                'applicable_rules': applicable if applicable or trivial else rule_ids,
+                'latency': response['metadata'].get('latency') or 0,
+                'model_id': self.triage_client.MODEL_ID
+            }
+
+        try:
+            triage = self.cache_client.get_or_compute(cache_key, compute_triage, 'screenshot_triage')
+        except (BudgetExceeded, CassetteMiss):
+            # A cassette miss means the replay is incomplete, not that triage is unsure
+            raise
+        except Exception as e:
+            # Anything the fast model cannot answer cleanly escalates with every rule
+            print(f"Triage failed for {image_path}, escalating with all rules: {str(e)}")
+            return {'trivial': False, 'applicable_rules': rule_ids, 'latency': 0, 'cached': False,
+                    'model_id': self.triage_client.MODEL_ID}
+        # A cached verdict cost this run no model call, so its recorded latency is not counted
+        return {**triage, 'latency': triage['latency'] if computed else 0, 'cached': not computed}
+
+    def unanalysed_result(self, image_path: str, prep_stage: Optional[ImagePrepStage] = None) -> Dict[str, Any]:
+        """Result for a screenshot that is reported without a full-model analysis"""
+        return {
+            'screenshot': os.path.basename(image_path),
+            'violations': [],
+            'screenshot_name': self.bedrock_client.normalize_path(os.path.abspath(image_path)),
+            'screenshot_path': image_path,
+            'screenshot_base64': prep_stage.get(image_path)['screenshot_base64'] if prep_stage
+                                 else self.encode_image_to_base64(image_path)
+        }
+
+    def prepared_image(self, image_path: str, image_token_budget: int,
+                       prep_stage: Optional[ImagePrepStage] = None) -> Dict[str, Any]:
+        """Prepared tiles and base64 copy of a screenshot, from the run's preparation stage if any"""
+        if prep_stage is not None:
+            return prep_stage.get(image_path, tiles=True)
+        return prepare_image(image_path, image_token_budget)
+
+    def filter_rules_analysis(self, rules_analysis: Any, rule_ids: List[str]) -> Any:
+        """Keep only the analysed rules whose IDs are in rule_ids"""
+        if isinstance(rules_analysis, dict) and 'rules' in rules_analysis:
+            return {**rules_analysis, 'rules': self.filter_rules_analysis(rules_analysis['rules'], rule_ids)}
+        if isinstance(rules_analysis, list):
+            return [rule for rule in rules_analysis if rule.get('rule_id') in rule_ids]
+        return rules_analysis
+
+    def analyze_screenshot_cascade(self,
+                                   persona: str,
+                                   image_path: str,
+                                   rules: List[Dict[str, Any]],
+                                   rules_analysis: Any,
+                                   image_token_budget: int = DEFAULT_IMAGE_TOKEN_BUDGET,
+                                   prep_stage: Optional[ImagePrepStage] = None) -> Dict[str, Any]:
+        """Triage with the fast model and escalate only what needs deeper reasoning"""
+        triage = self.triage_screenshot(persona, image_path, rules, prep_stage)
+        if triage['trivial'] or not triage['applicable_rules']:
+            analysis = self.unanalysed_result(image_path, prep_stage)
+            escalated = False
+        else:
+            analysis = self.analyze_screenshot(
+                persona, image_path, self.filter_rules_analysis(rules_analysis, triage['applicable_rules']),
+                image_token_budget, prep_stage)
+            escalated = True
+
+        analysis['triage'] = {
+            'model_id': triage['model_id'],
+            'trivial': triage['trivial'],
+            'escalated': escalated,
+            'rules_escalated': triage['applicable_rules'] if escalated else [],
+            'rules_skipped': len(rules) - len(triage['applicable_rules']) if escalated else len(rules),
+            'latency': triage['latency'],
+            'cached': triage['cached']
+        }
+        return analysis
+
+    def summarize_cascade(self, results: List[Dict[str, Any]], total_rules: int) -> Dict[str, Any]:
+        """
+        Escalation rates of the cascade for one run, and the model latency it
+        measured. Only calls made in this run count towards latency; cached
+        triage verdicts and analyses are reported separately. The latency saved
+        is an estimate: the mean full-model latency measured in this run times
+        the screenshots triage did not escalate, or None when no full-model
+        call was measured.
+        """
+        triaged = [result for result in results if 'triage' in result]
+        escalated = [result for result in triaged if result['triage']['escalated']]
+        triage_called = [result for result in triaged if not result['triage'].get('cached')]
+        full_called = [result for result in escalated if not result.get('cached')]
+        rules_escalated = sum(len(result['triage']['rules_escalated']) for result in escalated)
+        full_latency = sum(result.get('model_metadata', {}).get('latency') or 0 for result in full_called)
+
+        return {
+            'screenshots_triaged': len(triaged),
+            'screenshots_escalated': len(escalated),
+            'escalation_rate': round(len(escalated) / len(triaged), 3) if triaged else 0,
+            'rule_escalation_rate': round(rules_escalated / (len(triaged) * total_rules), 3) if triaged and total_rules else 0,
+            'triage_calls': len(triage_called),
+            'triage_latency_ms': sum(result['triage']['latency'] for result in triage_called),
+            'full_model_calls': len(full_called),
+            'full_model_latency_ms': full_latency,
+            'estimated_latency_saved_ms': round(full_latency / len(full_called) * (len(triaged) - len(escalated)))
+                                          if full_called else None,
+            'cached_triage': len(triaged) - len(triage_called),
+            'cached_analyses': len(escalated) - len(full_called)
+        }
+
+    def store_findings(self, session_id: Optional[str], persona: str, image_path: str, analysis: Dict[str, Any]) -> None:
+        """Index a screenshot's bugs in the findings store; never fails the analysis"""
+        if not self.findings_store or not session_id:
+            return
+        try:
+            self.findings_store.add_analysis(session_id, persona, self.image_digest(image_path), analysis,
+                                             tenant=self.budget.tenant or DEFAULT_TENANT)
+        except Exception as e:
+            print(f"Error storing findings for {image_path}: {str(e)}")
+
     def generate_report(self, 
                        rules: List[Dict[str, Any]], 
-                       analysis_results: List[Dict[str, Any]], 
+                       analysis_results: Iterable[Dict[str, Any]], 
                        output_path: str):
-        """Generate PDF report with screenshots and analysis"""
-        doc = SimpleDocTemplate(output_path, pagesize=letter)
-        story = []
-
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            spaceAfter=12
-        )
+        """Generate the PDF report with ReportLab, without starting a browser"""
+        NativePDFGenerator(output_path).generate_report(rules, analysis_results)
 
-        # Title
-        story.append(Paragraph("Inclusivity Analysis Report", title_style))
-        story.append(Spacer(1, 12))
+    def list_screenshots(self, screenshots_dir: str) -> List[str]:
+        """
+        Absolute paths of the screenshots to analyse, sorted, with duplicate images dropped.
+        Screen recordings are reduced to one keyframe per distinct UI state.
+        Every input is leased against storage eviction until release_inputs.
+        """
+        screenshots_dir = self.bedrock_client.IMAGES_PATH + screenshots_dir
+        screenshot_paths = []
+        already = set()
+        for screenshot in sorted(os.listdir(screenshots_dir)):
+            input_path = os.path.join(os.getcwd(), screenshots_dir, screenshot)
+            if screenshot.lower().endswith(('.png', '.jpg', '.jpeg')):
+                self.lease_input(input_path)
+                candidates = [input_path]
+            elif screenshot.lower().endswith(VIDEO_EXTENSIONS):
+                self.lease_input(input_path)
+                candidates = self.list_video_keyframes(input_path)
+            else:
+                continue
+            for screenshot_path in candidates:
+                image_key = self.image_digest(screenshot_path)
+                if image_key not in already:
+                    already.add(image_key)
+                    screenshot_paths.append(screenshot_path)
+        return screenshot_paths
 
-        # Create a rule lookup dictionary
-        rule_lookup = {rule['Rule ID']: rule for rule in rules}
+    def list_video_keyframes(self, video_path: str) -> List[str]:
+        """Extract a recording's keyframes and remember which video and time each came from"""
+        video_name = os.path.basename(video_path)
+        output_dir = os.path.join(os.path.dirname(video_path), 'keyframes', os.path.splitext(video_name)[0])
+        self.lease_input(output_dir)
+        extracted = extract_keyframes(video_path, output_dir)
+        print(f"Extracted {len(extracted['keyframes'])} keyframes from {extracted['frames_sampled']} sampled frames of {video_name}")
+        self.run_metadata.setdefault('videos', {})[video_name] = {
+            'duration': extracted['duration'],
+            'frames_sampled': extracted['frames_sampled'],
+            'keyframes': len(extracted['keyframes'])
+        }
+        for keyframe in extracted['keyframes']:
+            self.frame_sources[keyframe['path']] = {
+                'source': video_name,
+                'timestamp': keyframe['timestamp'],
+                'timestamp_label': format_timestamp(keyframe['timestamp'])
+            }
+        return [keyframe['path'] for keyframe in extracted['keyframes']]
 
-        for result in analysis_results:
-            # Screenshot info
-            story.append(Paragraph(f"Screenshot: {result['screenshot']}", heading_style))
+    def lease_input(self, path: str) -> None:
+        """Protect a file or directory this run reads from storage eviction"""
+        acquire_paths([path])
+        self.input_files.append(path)
 
-            # Add screenshot image if available
-            screenshot_path = os.path.join('screenshots', result['screenshot'])
-            if os.path.exists(screenshot_path):
-                img = Image(screenshot_path, width=6*inch, height=4*inch)
-                story.append(img)
-                story.append(Spacer(1, 12))
+    def release_inputs(self) -> None:
+        """Release this run's leases without deleting its inputs"""
+        release_paths(self.input_files)
+        self.input_files = []
 
-            # Process each violation
-            for violation in result['violations']:
-                rule = rule_lookup.get(violation['rule_id'], {})
-                
-                # Rule header with facet
-                story.append(Paragraph(
-                    f"Rule {rule.get('Rule ID', 'Unknown')}: {rule.get('Rule Name', 'Unknown')}",
-                    heading_style
-                ))
-                story.append(Paragraph(f"Facet: {rule.get('facet', 'Unknown')}", self.styles['Normal']))
-                story.append(Spacer(1, 12))
-
-                # Create table for bugs
-                if violation.get('bugs'):
-                    data = [['Issue', 'Categories', 'Location', 'Severity', 'Recommendation']]
-                    for bug in violation['bugs']:
-                        data.append([
-                            bug['description'],
-                            bug['categories'],
-                            bug['location'],
-                            bug['severity'],
-                            bug['recommendation']
-                        ])
-                    
-                    table = Table(data, colWidths=[2*inch, 1.5*inch, 1*inch, 2.5*inch])
-                    table.setStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 14),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                        ('FONTSIZE', (0, 1), (-1, -1), 12),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ])
-                    story.append(table)
-                
-                story.append(Spacer(1, 20))
+    def screenshot_budget(self, image_token_budget: Optional[int], screenshot_count: int) -> int:
+        """Each screenshot's share of the request's image-token budget"""
+        if not image_token_budget:
+            return DEFAULT_IMAGE_TOKEN_BUDGET
+        return max(1, image_token_budget // max(1, screenshot_count))
+
+    def process_screenshot(self,
+                           persona: str,
+                           screenshot_path: str,
+                           rules: List[Dict[str, Any]],
+                           rules_analysis: Any,
+                           screenshot_budget: int,
+                           session_id: Optional[str] = None,
+                           prep_stage: Optional[ImagePrepStage] = None) -> Dict[str, Any]:
+        """
+        Analyse one screenshot (through the cascade if enabled) and index its findings.
+        Once the token budget is spent, remaining screenshots are reported as skipped.
+        """
+        started = time.time()
+        try:
+            if self.cascade:
+                analysis = self.analyze_screenshot_cascade(
+                    persona, screenshot_path, rules, rules_analysis, screenshot_budget, prep_stage)
+            else:
+                analysis = self.analyze_screenshot(persona, screenshot_path, rules_analysis, screenshot_budget, prep_stage)
+        except BudgetExceeded as e:
+            print(f"Skipping {screenshot_path}: {str(e)}")
+            analysis = self.unanalysed_result(screenshot_path, prep_stage)
+            analysis['skipped'] = str(e)
+        finally:
+            if prep_stage is not None:
+                prep_stage.done(screenshot_path)
+        self.stage_stats['analysis'].record(started, time.time())
+        if screenshot_path in self.frame_sources:
+            # Map findings on a video keyframe back to where it appears in the recording
+            analysis['video'] = self.frame_sources[screenshot_path]
+        if 'skipped' not in analysis:
+            self.store_findings(session_id, persona, screenshot_path, analysis)
+        return analysis
 
-        doc.build(story)
+    def start_run(self) -> None:
+        """Reset the per-run state before a new run"""
+        self.run_metadata = {}
+        self.run_summaries = []
+        self.frame_sources = {}
+        self.input_files = []
+        self.image_digests = {}
+        self.stage_stats = {stage: StageStats() for stage in ('image_prep', 'analysis', 'report')}
 
-    def run_pipeline(self, persona: str, rules_csv_path: str, screenshots_dir: str, output_path: str) -> List[Dict[str, Any]]:
-        """Run the complete pipeline"""
+    def start_image_prep(self, persona: str, screenshot_paths: List[str], rules_analysis: Any,
+                         screenshot_budget: int) -> ImagePrepStage:
+        """
+        Start preparing the run's screenshots in worker processes, ahead of their
+        model calls. Screenshots whose analysis is already cached need no images.
+        """
+        if not self.cascade:
+            screenshot_paths = [
+                path for path in screenshot_paths
+                if self.cache_client.get_cached_data(
+                    self.analysis_cache_key(persona, path, rules_analysis, screenshot_budget), 'screenshot_analysis') is None
+            ]
+        return ImagePrepStage(screenshot_paths, screenshot_budget, triage=self.cascade,
+                              stats=self.stage_stats['image_prep'])
+
+    def record_report_stage(self, started: float) -> None:
+        """Time the report render and add it to the run's stage throughput"""
+        self.stage_stats['report'].record(started, time.time())
+        self.run_metadata['stages'] = {stage: stats.report() for stage, stats in self.stage_stats.items()}
+
+    def record_result(self, analysis: Dict[str, Any]) -> None:
+        """Keep the small per-screenshot fields run metadata is computed from"""
+        self.run_summaries.append({
+            key: analysis[key] for key in ('triage', 'model_metadata', 'image_budget', 'skipped', 'cached') if key in analysis
+        })
+
+    def finish_run(self, rules: List[Dict[str, Any]]) -> None:
+        """Record run-level metadata once every screenshot is analysed"""
+        self.run_metadata['spend'] = {
+            **self.budget.report(),
+            'screenshots_skipped': sum(1 for summary in self.run_summaries if 'skipped' in summary)
+        }
+        if self.cascade:
+            self.run_metadata['cascade'] = self.summarize_cascade(self.run_summaries, len(rules))
+        # Items per second and time spent per stage, to show which one bounds the run
+        self.run_metadata['stages'] = {stage: stats.report() for stage, stats in self.stage_stats.items()}
+
+    def run_pipeline_streaming(self, persona: str, rules_csv_path: str, screenshots_dir: str, output_path: str,
+                               image_token_budget: Optional[int] = None, session_id: Optional[str] = None) -> ResultSpool:
+        """
+        Run the complete pipeline, spooling each result to disk as it completes.
+        Peak memory stays at about one screenshot's analysis regardless of upload size.
+        image_token_budget is shared across all screenshots if given, and findings are
+        indexed under session_id when a findings store is set. The caller owns (and
+        must close) the returned spool.
+        """
+        results = None
+        prep_stage = None
         try:
+            self.start_run()
             # Read rules
             rules = self.read_decision_rules(rules_csv_path, persona)
             time.sleep(5)
@@ -308,22 +603,19 @@ class InclusivityPipeline:
             # Generate comprehensive analysis for all rules
             rules_analysis = self.generate_rules_analysis(rules)
             #rules_analysis = {'rules': [{'rule_id': 'DR1', 'analysis': {'description': 'This rule ensures error messages are complete and actionable by requiring three key components: the error identification, cause explanation, and resolution steps', 'common_bugs': ['Vague error messages that only state an error occurred', "Technical jargon in error messages that users don't understand", 'Missing resolution steps or next actions', 'Blaming language that makes users feel at fault', 'Error messages that create anxiety or uncertainty'], 'identification': {'steps': ['Review all error messages in the interface', 'Check if each error message includes what went wrong', 'Verify the cause is clearly explained', 'Confirm specific resolution steps are provided', 'Test if messages make sense to non-technical users']}, 'impact': {'positive_outcomes': ['Reduces user frustration and anxiety', 'Increases user confidence in handling errors', 'Improves problem resolution success rate', 'Makes the system feel more supportive and helpful', 'Decreases support tickets and user abandonment'], 'negative_if_violated': ['Users feel lost and helpless when errors occur', 'Higher system abandonment rates', 'Increased support costs', 'Lower user satisfaction and trust', 'Higher cognitive load on users trying to resolve issues']}}}]}
-            results = []
-            already = {}
+            results = ResultSpool()
             # Process each screenshot
-            screenshots_dir = self.bedrock_client.IMAGES_PATH + screenshots_dir
-            # print(sorted(os.listdir(screenshots_dir)))
-            for screenshot in sorted(os.listdir(screenshots_dir)):
-                if screenshot.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    screenshot_path = os.path.join(os.getcwd(), screenshots_dir, screenshot)
-                    print(f"Processing screenshot: {screenshot_path}")
-                    image_key = self.encode_image_to_base64(screenshot_path)
-                    if image_key in already:
-                        continue
-                    else:
-                        analysis = self.analyze_screenshot(persona, screenshot_path, rules_analysis)
-                        results.append(analysis)
-                        already[image_key] = True
+            screenshot_paths = self.list_screenshots(screenshots_dir)
+            screenshot_budget = self.screenshot_budget(image_token_budget, len(screenshot_paths))
+            # The next screenshots are resized and encoded while the current one is with the model
+            prep_stage = self.start_image_prep(persona, screenshot_paths, rules_analysis, screenshot_budget)
+            for screenshot_path in screenshot_paths:
+                print(f"Processing screenshot: {screenshot_path}")
+                analysis = self.process_screenshot(
+                    persona, screenshot_path, rules, rules_analysis, screenshot_budget, session_id, prep_stage)
+                results.append(analysis)
+                self.record_result(analysis)
+                del analysis
             '''
             results = [
             {
@@ -370,11 +662,31 @@ class InclusivityPipeline:
             #             violation['bugs'] = [bug for bug in violation['bugs'] 
             #                                 if bug.get('severity', '').lower() in ['high', 'medium']]
 
+            self.finish_run(rules)
+
+            report_started = time.time()
             generate_inclusivity_report(rules, results, output_path)
+            self.record_report_stage(report_started)
             return results
 
         except Exception as e:
+            if results is not None:
+                results.close()
+            self.release_inputs()
+            if isinstance(e, CassetteMiss):
+                raise
             raise Exception(f"Pipeline error: {str(e)}")
+        finally:
+            if prep_stage is not None:
+                prep_stage.close()
+
+    def run_pipeline(self, persona: str, rules_csv_path: str, screenshots_dir: str, output_path: str,
+                     image_token_budget: Optional[int] = None, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Run the complete pipeline and return all results as a list"""
+        with self.run_pipeline_streaming(persona, rules_csv_path, screenshots_dir, output_path,
+                                         image_token_budget, session_id) as results:
+            self.release_inputs()
+            return list(results)
 
 
 if __name__ == "__main__":
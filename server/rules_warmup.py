@@ -0,0 +1,139 @@
+# rules_warmup.py
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+from pipeline import InclusivityPipeline
+from TokenScheduler import RequestBudget, BATCH
+
+
+class RulesWarmer:
+    """
+    Precompute the rules analysis for every persona rules CSV in the background.
+
+    Each "{PERSONA}_{rules_csv}" file is analysed and validated once at start, and
+    again whenever its modification time changes, so user requests find the rules
+    analysis already cached instead of waiting on an extra model call. A persona
+    that fails is retried with exponential backoff, from one poll interval up to
+    max_backoff seconds, or as soon as its rules file changes.
+    """
+
+    def __init__(self, rules_csv: str, poll_interval: float = 30.0, max_backoff: float = 3600.0):
+        self.rules_csv = rules_csv
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.status: Dict[str, Dict[str, Any]] = {}
+        self._mtimes: Dict[str, float] = {}
+        # Per failed rules file: (mtime that failed, consecutive failures, next retry time)
+        self._failures: Dict[str, Tuple[float, int, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def find_rules_files(self) -> Dict[str, str]:
+        """Map persona ID to its rules CSV path"""
+        suffix = f"_{self.rules_csv}"
+        files = {}
+        for path in glob.glob(f"*{glob.escape(suffix)}"):
+            persona = os.path.basename(path)[:-len(suffix)]
+            if persona:
+                files[persona.upper()] = path
+        return files
+
+    def backoff(self, failures: int) -> float:
+        """Seconds to wait before retrying after this many consecutive failures"""
+        return min(self.max_backoff, self.poll_interval * 2 ** (failures - 1))
+
+    def warm_persona(self, persona: str) -> bool:
+        """Compute and validate the rules analysis for one persona, evicting bad cache entries"""
+        self._set_status(persona, 'warming')
+        started = time.time()
+        # Warm-up queues behind user analyses and is not charged to any tenant
+        pipeline = InclusivityPipeline(budget=RequestBudget(tenant=None, priority=BATCH, token_limit=None))
+        rules = None
+        try:
+            rules = pipeline.read_decision_rules(self.rules_csv, persona)
+            try:
+                pipeline.validate_rules_analysis(rules, pipeline.generate_rules_analysis(rules))
+            except Exception as e:
+                # A cached analysis from an earlier bad response gets one fresh attempt
+                print(f"Recomputing rules analysis for {persona}: {str(e)}")
+                pipeline.cache_client.delete_cached_data(pipeline.rules_cache_key(rules), 'rules_analysis')
+                pipeline.validate_rules_analysis(rules, pipeline.generate_rules_analysis(rules))
+            self._set_status(persona, 'ready', duration=round(time.time() - started, 2))
+            return True
+        except Exception as e:
+            # Do not leave an incomplete analysis in the cache for user requests
+            if rules is not None:
+                pipeline.cache_client.delete_cached_data(pipeline.rules_cache_key(rules), 'rules_analysis')
+            print(f"Rules warm-up failed for {persona}: {str(e)}")
+            self._set_status(persona, 'failed', error=str(e))
+            return False
+
+    def check_for_changes(self) -> None:
+        """Warm every persona whose rules file is new or modified, or whose retry is due"""
+        now = time.time()
+        for persona, path in self.find_rules_files().items():
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if self._mtimes.get(path) == mtime:
+                continue
+            failed_mtime, failures, retry_at = self._failures.get(path, (None, 0, 0.0))
+            if failed_mtime != mtime:
+                # New or edited file: try at once, with a fresh backoff
+                failures, retry_at = 0, 0.0
+            if now < retry_at:
+                continue
+            if self.warm_persona(persona):
+                self._mtimes[path] = mtime
+                self._failures.pop(path, None)
+            else:
+                failures += 1
+                retry_at = time.time() + self.backoff(failures)
+                self._failures[path] = (mtime, failures, retry_at)
+                self._update_status(persona, failures=failures,
+                                    retry_at=datetime.fromtimestamp(retry_at).isoformat(timespec='seconds'))
+
+    def start(self) -> None:
+        """Start the background warm-up thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        for persona in self.find_rules_files():
+            self._set_status(persona, 'pending')
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='rules-warmer', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return bool(self.status) and all(entry['state'] == 'ready' for entry in self.status.values())
+
+    def report(self) -> Dict[str, Any]:
+        """Readiness summary for the health endpoint"""
+        with self._lock:
+            personas = {persona: dict(entry) for persona, entry in self.status.items()}
+        return {'ready': self.is_ready(), 'personas': personas}
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check_for_changes()
+            self._stop.wait(self.poll_interval)
+
+    def _update_status(self, persona: str, **details: Any) -> None:
+        with self._lock:
+            self.status.get(persona, {}).update(details)
+
+    def _set_status(self, persona: str, state: str, **details: Any) -> None:
+        with self._lock:
+            self.status[persona] = {
+                'state': state,
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+                **details
+            }
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Server modules import each other by name, as they do when run from server/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """The Flask app, imported inside an empty working directory without its background services"""
+    monkeypatch.chdir(tmp_path)
+    for name in ('app', 'asgi'):
+        sys.modules.pop(name, None)
+    import app
+    monkeypatch.setattr(app, '_services_started', True)
+    yield app
+    for name in ('app', 'asgi'):
+        sys.modules.pop(name, None)
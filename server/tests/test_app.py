@@ -0,0 +1,28 @@
+import json
+
+from werkzeug.datastructures import Headers, MultiDict
+
+from TokenScheduler import INTERACTIVE, BATCH
+
+
+def parse(app_module, image_count, headers=(), **fields):
+    form = MultiDict({'persona': json.dumps({'name': 'ABI'}), **fields})
+    return app_module.parse_analysis_request(form, Headers(list(headers)), image_count, 'session', 'images/screenshots/x')
+
+
+def test_priority_is_derived_by_the_server_and_can_only_be_lowered(app_module):
+    large = app_module.BATCH_IMAGE_THRESHOLD + 1
+    assert parse(app_module, 1)[0]['budget'].priority == INTERACTIVE
+    assert parse(app_module, 1, priority='batch')[0]['budget'].priority == BATCH
+    assert parse(app_module, large)[0]['budget'].priority == BATCH
+    assert parse(app_module, large, priority='interactive')[0]['budget'].priority == BATCH
+
+
+def test_tenant_comes_from_the_api_key_not_the_form(app_module, monkeypatch):
+    assert parse(app_module, 1, tenant='someone-else')[0]['budget'].tenant == 'default'
+
+    monkeypatch.setattr(app_module, 'TENANT_API_KEYS', {'key-a': 'team-a'})
+    params, error = parse(app_module, 1, [('X-API-Key', 'key-a')], tenant='team-b')
+    assert params['budget'].tenant == 'team-a'
+    params, error = parse(app_module, 1, tenant='team-a')
+    assert params is None and error[1] == 401
@@ -0,0 +1,105 @@
+import asyncio
+import io
+import json
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.test import encode_multipart
+
+
+@pytest.fixture
+def asgi_module(app_module):
+    import asgi
+    return asgi
+
+
+def post(asgi_module, body, content_type, chunk_size=7):
+    """Send a POST /api/analyze through the ASGI app, body split into small chunks"""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b'']
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': index < len(chunks) - 1}
+                for index, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/analyze',
+             'headers': [(b'content-type', content_type.encode())]}
+    asyncio.run(asgi_module.application(scope, receive, send))
+    status = sent[0]['status']
+    return status, json.loads(b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+def analyze_form(*images):
+    form = MultiDict({'persona': json.dumps({'name': 'ABI'})})
+    for name, data in images:
+        form.add('images', FileStorage(io.BytesIO(data), name))
+    return encode_multipart(form)
+
+
+def test_upload_is_streamed_into_the_request_folder(asgi_module, monkeypatch):
+    from ResultSpool import ResultSpool
+    seen = {}
+
+    class FakePipeline:
+        def __init__(self, pipeline):
+            self.run_metadata = {}
+            self.input_files = []
+
+        async def run_pipeline_streaming(self, persona, rules_csv_path, screenshots_dir, output_path,
+                                         image_token_budget=None, session_id=None):
+            folder = os.path.join('images', screenshots_dir)
+            for name in sorted(os.listdir(folder)):
+                with open(os.path.join(folder, name), 'rb') as f:
+                    seen[name] = f.read()
+            results = ResultSpool()
+            results.append({'persona': persona}, 0)
+            return results
+
+    monkeypatch.setattr(asgi_module, 'AsyncInclusivityPipeline', FakePipeline)
+    monkeypatch.setattr(asgi_module, 'InclusivityPipeline', lambda **kwargs: None)
+    login = bytes(range(256)) * 40
+    boundary, body = analyze_form(('login.png', login), ('login.png', b'\r\n--x'))
+
+    status, response = post(asgi_module, body, f'multipart/form-data; boundary={boundary}')
+
+    assert status == 200
+    assert seen == {'login.png': login, 'login_1.png': b'\r\n--x'}
+    assert response['analysis_results'] == [{'persona': 'ABI'}]
+    assert os.listdir('images/screenshots/analyses') == []
+
+
+def test_oversized_upload_is_rejected_and_discarded(asgi_module, monkeypatch):
+    monkeypatch.setattr(asgi_module, 'MAX_UPLOAD_BYTES', 1000)
+    boundary, body = analyze_form(('login.png', b'x' * 2000))
+
+    status, response = post(asgi_module, body, f'multipart/form-data; boundary={boundary}', chunk_size=256)
+
+    assert status == 413
+    assert os.listdir('images/screenshots/analyses') == []
+
+
+def test_request_without_images_is_rejected(asgi_module):
+    status, response = post(asgi_module, b'{}', 'application/json')
+
+    assert status == 400
+    assert response == {'error': 'No images provided'}
+    assert os.listdir('images/screenshots/analyses') == []
+
+
+def test_file_data_survives_every_chunk_split(asgi_module, tmp_path):
+    data = b'a\r\n--x\r'
+    boundary, body = analyze_form(('login.png', data))
+    for split in range(1, len(body)):
+        upload_dir = tmp_path / str(split)
+        upload_dir.mkdir()
+        reader = asgi_module.UploadReader(f'multipart/form-data; boundary={boundary}', str(upload_dir))
+        for chunk in (body[:split], body[split:], None):
+            reader.feed(chunk)
+        reader.close()
+        assert (upload_dir / 'login.png').read_bytes() == data, split
+        assert json.loads(reader.form['persona']) == {'name': 'ABI'}
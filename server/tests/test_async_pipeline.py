@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+
+from async_pipeline import PriorityExecutor
+from TokenScheduler import TokenScheduler, RequestBudget, INTERACTIVE, BATCH
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_interactive_work_is_not_starved_by_batch_work_holding_the_pool():
+    scheduler = TokenScheduler(concurrency=1, tenant_token_limit=0)
+    executor = PriorityExecutor(max_workers=2)
+    admitted = []
+    blocker = threading.Event()
+
+    def call(name, priority):
+        with scheduler.admit(RequestBudget(priority=priority, token_limit=None), 10):
+            admitted.append(name)
+            if name == 'batch-0':
+                blocker.wait()
+
+    futures = [executor.submit(BATCH, call, f'batch-{index}', BATCH) for index in range(5)]
+    # One batch call holds the only model slot and another waits for it on the second thread;
+    # the rest are queued for a thread
+    wait_for(lambda: admitted == ['batch-0'] and len(scheduler._waiting) == 1)
+    futures.append(executor.submit(INTERACTIVE, call, 'interactive', INTERACTIVE))
+    blocker.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    # The interactive call takes the first free thread, ahead of the batch calls queued
+    # before it; only the batch call already waiting on the scheduler may go first
+    assert admitted[0] == 'batch-0' and admitted[-3:] == ['batch-2', 'batch-3', 'batch-4']
+
+
+def test_failed_calls_raise_from_their_future():
+    executor = PriorityExecutor(max_workers=1)
+
+    def fail():
+        raise ValueError('model error')
+
+    with pytest.raises(ValueError, match='model error'):
+        executor.submit(BATCH, fail).result(timeout=5)
+    assert executor.submit(BATCH, lambda: 'next call').result(timeout=5) == 'next call'
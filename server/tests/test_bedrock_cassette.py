@@ -0,0 +1,63 @@
+import pytest
+
+import BedrockClient
+from BedrockCassette import BedrockCassette, CassetteMiss, request_digest
+
+
+def message(text, image=b'\x89PNG image'):
+    return [{'role': 'user', 'content': [
+        {'text': text},
+        {'image': {'format': 'png', 'source': {'bytes': image}}}
+    ]}]
+
+
+RESPONSE = {
+    'output': {'message': {'role': 'assistant', 'content': [{'text': '{"violations": []}'}]}},
+    'stopReason': 'end_turn',
+    'usage': {'inputTokens': 1200, 'outputTokens': 40},
+    'metrics': {'latencyMs': 850},
+    'ResponseMetadata': {'RequestId': 'not recorded'}
+}
+
+
+def test_digest_is_stable_and_covers_everything_sent():
+    config = {'maxTokens': 512, 'temperature': 0.7, 'topP': 0.9}
+    digest = request_digest('model', message('prompt'), config)
+
+    # Same request, built again and with the settings in another order
+    assert request_digest('model', message('prompt'), dict(reversed(list(config.items())))) == digest
+    assert len({
+        digest,
+        request_digest('other-model', message('prompt'), config),
+        request_digest('model', message('prompt '), config),
+        request_digest('model', message('prompt', image=b'\x89PNG other image'), config),
+        request_digest('model', message('prompt'), {**config, 'maxTokens': 8192}),
+    }) == 5
+
+
+def test_recorded_calls_replay_without_the_model(tmp_path):
+    config = {'maxTokens': 512}
+    calls = []
+    recorder = BedrockCassette('record', str(tmp_path))
+    live = recorder.converse('model', message('prompt'), config, lambda: calls.append(1) or RESPONSE)
+
+    player = BedrockCassette('replay', str(tmp_path), latency_scale=0)
+    replayed = player.converse('model', message('prompt'), config, lambda: pytest.fail('replay called the model'))
+
+    assert live is RESPONSE and calls == [1]
+    assert replayed == {key: RESPONSE[key] for key in ('output', 'stopReason', 'usage', 'metrics')}
+    assert (recorder.report()['recorded'], player.report()['replayed']) == (1, 1)
+
+
+def test_unrecorded_call_raises_cassette_miss(tmp_path):
+    player = BedrockCassette('replay', str(tmp_path), latency_scale=0)
+    with pytest.raises(CassetteMiss):
+        player.converse('model', message('new prompt'), {}, lambda: pytest.fail('replay called the model'))
+    assert player.report()['misses'] == 1
+
+
+def test_client_lets_cassette_misses_through_as_such(tmp_path, monkeypatch):
+    monkeypatch.setattr(BedrockClient, 'get_cassette', lambda: BedrockCassette('replay', str(tmp_path), 0))
+    client = BedrockClient.BedrockClient('model')
+    with pytest.raises(CassetteMiss):
+        client.call_claude('prompt', [])
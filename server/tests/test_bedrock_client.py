@@ -0,0 +1,31 @@
+import boto3
+from botocore.exceptions import EndpointConnectionError
+from botocore.stub import Stubber
+
+from BedrockClient import preconnect_bedrock_runtime
+
+
+def runtime():
+    return boto3.client('bedrock-runtime', region_name='us-east-1',
+                        aws_access_key_id='test', aws_secret_access_key='test')
+
+
+def test_preconnect_operation_exists_on_the_pinned_client():
+    assert 'InvokeModel' in runtime().meta.service_model.operation_names
+
+
+def test_rejected_preconnect_request_counts_as_connected():
+    client = runtime()
+    with Stubber(client) as stubber:
+        stubber.add_client_error('invoke_model', 'ValidationException', http_status_code=400,
+                                 expected_params={'modelId': 'model', 'body': b'{}'})
+        assert preconnect_bedrock_runtime(client, 'model')
+        stubber.assert_no_pending_responses()
+
+
+def test_unreachable_endpoint_fails_preconnect():
+    class Unreachable:
+        def invoke_model(self, **kwargs):
+            raise EndpointConnectionError(endpoint_url='https://bedrock-runtime.us-east-1.amazonaws.com')
+
+    assert not preconnect_bedrock_runtime(Unreachable(), 'model')
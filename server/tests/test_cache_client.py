@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from CacheClient import CacheClient
+
+
+def test_concurrent_callers_share_one_computation(tmp_path):
+    cache = CacheClient(str(tmp_path))
+    calls = []
+    start = threading.Barrier(8)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'value': len(calls)}
+
+    def caller():
+        start.wait()
+        results.append(cache.get_or_compute('key', compute, 'analysis'))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'value': 1}] * 8
+
+
+def test_different_keys_compute_in_parallel(tmp_path):
+    cache = CacheClient(str(tmp_path))
+    started = time.time()
+    threads = [
+        threading.Thread(target=cache.get_or_compute, args=(f'key{index}', lambda: time.sleep(0.3) or {'ok': True}))
+        for index in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.time() - started < 1.0
+
+
+def test_lock_files_are_removed_after_release(tmp_path):
+    cache = CacheClient(str(tmp_path))
+    cache.get_or_compute('key', lambda: {'ok': True}, 'analysis')
+    with cache.lock('other', 'analysis'):
+        pass
+    lock_dir = tmp_path / 'locks' / 'analysis'
+    assert not lock_dir.exists() or os.listdir(lock_dir) == []
+
+
+def test_failed_computation_is_not_cached(tmp_path):
+    cache = CacheClient(str(tmp_path))
+
+    def fail():
+        raise RuntimeError('model error')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('key', fail)
+    assert cache.get_or_compute('key', lambda: {'ok': True}) == {'ok': True}
+
+
+def _compute_in_process(cache_dir, counter_path):
+    cache = CacheClient(cache_dir)
+
+    def compute():
+        with open(counter_path, 'a') as counter:
+            counter.write('x')
+        time.sleep(0.3)
+        return {'ok': True}
+
+    cache.get_or_compute('shared', compute)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_processes_share_one_computation(tmp_path):
+    counter_path = str(tmp_path / 'calls')
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_compute_in_process, args=(str(tmp_path / 'cache'), counter_path))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    with open(counter_path) as counter:
+        assert counter.read() == 'x'
@@ -0,0 +1,39 @@
+import sqlite3
+
+from FindingsStore import FindingsStore
+
+ANALYSIS = {
+    'screenshot_path': '/uploads/login.png',
+    'violations': [{
+        'rule_id': 'DR1',
+        'bugs': [{'description': 'Vague error', 'categories': 'Guidance; Risk', 'severity': 'high'}]
+    }]
+}
+
+
+def test_queries_only_see_their_tenant(tmp_path):
+    store = FindingsStore(str(tmp_path / 'findings.db'))
+    store.add_analysis('s1', 'abi', 'digest1', ANALYSIS, tenant='acme')
+    store.add_analysis('s2', 'abi', 'digest2', ANALYSIS, tenant='globex')
+
+    acme = store.query('acme')
+    assert acme['total'] == 1
+    assert acme['findings'][0]['session_id'] == 's1'
+    # Filters narrow within the tenant and cannot reach another one
+    assert store.query('acme', session_id='s2')['total'] == 0
+    assert store.aggregate('globex', 'category')['total'] == 2
+    assert store.aggregate('initech', 'rule_id')['groups'] == []
+
+
+def test_existing_database_gains_default_tenant(tmp_path):
+    path = str(tmp_path / 'findings.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute("""CREATE TABLE findings (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,
+                        created_at TEXT NOT NULL, persona TEXT NOT NULL, screenshot_digest TEXT NOT NULL,
+                        screenshot_name TEXT, rule_id TEXT, severity TEXT, categories TEXT, description TEXT,
+                        location TEXT, recommendation TEXT)""")
+        conn.execute("""INSERT INTO findings (session_id, created_at, persona, screenshot_digest)
+                        VALUES ('old', '2025-01-01T00:00:00+00:00', 'ABI', 'digest')""")
+    store = FindingsStore(path)
+    assert store.query('default')['total'] == 1
+    assert store.query('acme')['total'] == 0
@@ -0,0 +1,58 @@
+from PIL import Image
+
+import image_budget
+from image_budget import (prepare_screenshot, split_tiles, trim_whitespace, MAX_TILES, MIN_IMAGE_DIMENSION,
+                          BLANK_IMAGE_DIMENSION, MAX_EMPTY_RUN, DEFAULT_IMAGE_TOKEN_BUDGET)
+
+
+def page(width, height, blocks):
+    """A white page with dark content blocks given as (top, bottom) rows"""
+    image = Image.new('RGB', (width, height), 'white')
+    for top, bottom in blocks:
+        image.paste((20, 20, 20), (50, top, width - 50, bottom))
+    return image
+
+
+def test_trim_crops_borders_and_collapses_empty_bands():
+    trimmed = trim_whitespace(page(800, 1000, [(100, 200), (600, 700)]))
+    # Borders are cropped and the 400-row gap between the blocks is collapsed
+    assert trimmed.size == (700, 200 + MAX_EMPTY_RUN)
+
+
+def test_blank_screen_is_shrunk_to_a_thumbnail():
+    assert max(trim_whitespace(page(800, 1600, [])).size) == BLANK_IMAGE_DIMENSION
+
+
+def test_tall_captures_are_split_into_at_most_max_tiles():
+    assert len(split_tiles(page(800, 1600, []))) == 1
+    assert len(split_tiles(page(800, 4000, []))) == 3
+    tiles = split_tiles(page(400, 100_000, []))
+    assert len(tiles) == MAX_TILES
+    # The tiles overlap and cover the whole capture
+    assert sum(tile.height for tile in tiles) > 100_000
+
+
+def test_tiles_never_shrink_below_the_minimum_dimension(tmp_path):
+    path = tmp_path / 'feed.png'
+    page(800, 40_000, [(0, 40_000)]).save(path)
+
+    prepared = prepare_screenshot(str(path), DEFAULT_IMAGE_TOKEN_BUDGET)
+
+    # The budget cannot pay for MAX_TILES readable tiles, so there are fewer, taller ones
+    assert 1 < prepared['budget']['tiles'] < MAX_TILES
+    for tile_path in prepared['tile_paths']:
+        with Image.open(tile_path) as tile:
+            assert max(tile.size) >= MIN_IMAGE_DIMENSION
+    assert prepared['budget']['estimated_image_tokens'] <= DEFAULT_IMAGE_TOKEN_BUDGET
+    assert prepared['budget']['budget_exceeded'] is False
+
+
+def test_budget_too_small_for_one_readable_tile_is_recorded_as_exceeded(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_budget, 'MIN_IMAGE_DIMENSION', 1024)
+    path = tmp_path / 'form.png'
+    page(800, 1200, [(0, 1200)]).save(path)
+
+    prepared = prepare_screenshot(str(path), 100)
+
+    assert prepared['budget']['tiles'] == 1
+    assert prepared['budget']['budget_exceeded'] is True
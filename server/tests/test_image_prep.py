@@ -0,0 +1,50 @@
+import os
+
+from PIL import Image
+
+import image_prep
+from image_prep import ImagePrepStage
+
+
+def make_screenshot(path, height=3000):
+    Image.new('RGB', (800, height), 'white').save(path)
+    with Image.open(path) as image:
+        image.paste((20, 20, 20), (100, 100, 700, height - 100))
+        image.save(path)
+    return str(path)
+
+
+def resized(tmp_path):
+    return sorted(os.listdir(tmp_path / 'resized'))
+
+
+def test_cascade_prepares_tiles_only_for_escalated_screens(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_prep, 'IMAGE_PREP_WORKERS', 0)
+    skipped, escalated = make_screenshot(tmp_path / 'splash.png'), make_screenshot(tmp_path / 'form.png')
+    stage = ImagePrepStage([skipped, escalated], 1600, triage=True)
+
+    assert stage.get(skipped)['triage_path'] and 'tile_paths' not in stage.get(skipped)
+    stage.done(skipped)
+    tiled = stage.get(escalated, tiles=True)
+    stage.close()
+
+    assert tiled['tile_paths'] and tiled['screenshot_base64'].startswith('data:image/png;base64,')
+    assert not any(name.startswith('splash') and '_tile' in name for name in resized(tmp_path))
+    assert any(name.startswith('form') and '_tile' in name for name in resized(tmp_path))
+    assert stage.stats.report()['items'] == 2
+
+
+def test_triage_images_of_different_content_never_share_a_file(tmp_path):
+    path = make_screenshot(tmp_path / 'login.png', 1200)
+    first = image_prep.prepare_triage_image(path)
+    make_screenshot(tmp_path / 'login.png', 1400)
+    second = image_prep.prepare_triage_image(path)
+    assert first != second
+    assert os.path.exists(first) and os.path.exists(second)
+
+
+def test_pool_workers_are_not_forked(tmp_path):
+    pool = image_prep.get_process_pool()
+    assert pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+    prepared = pool.submit(image_prep.prepare_image, make_screenshot(tmp_path / 'screen.png'), 1600).result()
+    assert prepared['tile_paths']
@@ -0,0 +1,61 @@
+import importlib
+
+import pytest
+from PIL import Image
+
+import pdf_generator_v2
+from image_prep import encode_data_url
+
+RULES = [{'Rule ID': 'DR1', 'Rule Name': 'Label every field', 'Facet': 'Attitude toward Risk'}]
+BUG = {'location': 'Sign-up form', 'categories': 'Attitude toward Risk', 'description': 'No label on the email field',
+       'recommendation': 'Add a visible label'}
+
+
+@pytest.fixture
+def reportlab_backend(monkeypatch):
+    """pdf_generator_v2 as loaded by a server started with PDF_BACKEND=reportlab"""
+    monkeypatch.setenv('PDF_BACKEND', 'reportlab')
+    yield importlib.reload(pdf_generator_v2)
+    monkeypatch.undo()
+    importlib.reload(pdf_generator_v2)
+
+
+def results(tmp_path):
+    image_path = tmp_path / 'form.png'
+    Image.new('RGB', (400, 600), 'grey').save(image_path)
+    data_url = encode_data_url(str(image_path))
+    image_path.unlink()
+    return [
+        {'screenshot': 'splash.png', 'violations': [], 'screenshot_path': str(tmp_path / 'splash.png'),
+         'skipped': 'token budget exhausted'},
+        # The upload is gone, only the base64 copy is left
+        {'screenshot': 'form.png', 'screenshot_path': str(image_path), 'screenshot_base64': data_url,
+         'violations': [{'rule_id': 'DR1', 'bugs': [BUG]}]}
+    ]
+
+
+def images(pdf):
+    return pdf.count(b'/Subtype /Image')
+
+
+def test_pdf_backend_setting_selects_the_reportlab_generator(reportlab_backend, tmp_path):
+    from pdf_generator_native import NativePDFGenerator
+
+    assert reportlab_backend.PDF_BACKEND == 'reportlab'
+    assert isinstance(reportlab_backend.get_report_generator(str(tmp_path / 'report.pdf')), NativePDFGenerator)
+    with pytest.raises(ValueError):
+        reportlab_backend.get_report_generator(str(tmp_path / 'report.pdf'), 'latex')
+
+
+def test_reportlab_report_renders_skipped_screens_and_missing_files(reportlab_backend, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    analysed = results(tmp_path)
+
+    reportlab_backend.generate_inclusivity_report(RULES, analysed, str(tmp_path / 'report.pdf'))
+    reportlab_backend.generate_inclusivity_report(
+        RULES, [{**result, 'screenshot_base64': None} for result in analysed], str(tmp_path / 'no-images.pdf'))
+
+    pdf = (tmp_path / 'report.pdf').read_bytes()
+    assert pdf.startswith(b'%PDF-') and pdf.rstrip().endswith(b'%%EOF')
+    # The missing screenshot is drawn from its base64 copy
+    assert images(pdf) == images((tmp_path / 'no-images.pdf').read_bytes()) + 1
@@ -0,0 +1,138 @@
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import pipeline
+
+RULES = [{'Rule ID': 'DR1', 'Rule Name': 'Labels'}, {'Rule ID': 'DR2', 'Rule Name': 'Defaults'}]
+RULES_ANALYSIS = [{'rule_id': 'DR1'}, {'rule_id': 'DR2'}]
+
+
+class FakeBedrockClient:
+    """Answers like BedrockClient.call_claude, with the reply chosen by the image's file name"""
+
+    def __init__(self, model_id, replies, latency):
+        self.MODEL_ID = model_id
+        self.replies = replies
+        self.latency = latency
+        self.calls = []
+
+    def normalize_path(self, path):
+        return path
+
+    def call_claude(self, prompt, image_paths, max_tokens=8192, prepared=False, budget=None):
+        self.calls.append({'prompt': prompt, 'image_paths': image_paths})
+        name = os.path.basename(image_paths[0])
+        reply = next(reply for stem, reply in self.replies.items() if name.startswith(stem))
+        if isinstance(reply, Exception):
+            raise reply
+        return {'response': json.dumps(reply),
+                'metadata': {'input_tokens': 1000, 'output_tokens': 50, 'latency': self.latency}}
+
+
+def make_screenshot(path, colour):
+    Image.new('RGB', (800, 1200), colour).save(path)
+    return str(path)
+
+
+@pytest.fixture
+def make_pipeline(tmp_path, monkeypatch):
+    """Pipelines whose model clients are fakes, sharing a cache in an empty working directory"""
+    monkeypatch.chdir(tmp_path)
+
+    def make(triage_replies=None, cascade=True):
+        clients = {'full': FakeBedrockClient('full-model', {'': {'violations': []}}, latency=2000),
+                   'triage': FakeBedrockClient('triage-model', triage_replies or {}, latency=100)}
+        monkeypatch.setattr(pipeline, 'get_bedrock_client',
+                            lambda model_id=None: clients['triage' if model_id else 'full'])
+        return pipeline.InclusivityPipeline(cascade=cascade), clients
+
+    return make
+
+
+def run_cascade(instance, screenshots):
+    for screenshot in screenshots:
+        instance.record_result(instance.analyze_screenshot_cascade('abi', screenshot, RULES, RULES_ANALYSIS))
+    return instance.summarize_cascade(instance.run_summaries, len(RULES))
+
+
+def test_cascade_escalates_only_screens_with_applicable_rules(tmp_path, make_pipeline):
+    screenshots = [make_screenshot(tmp_path / 'splash.png', 'white'), make_screenshot(tmp_path / 'form.png', 'grey')]
+    instance, clients = make_pipeline({'splash': {'trivial': True, 'applicable_rules': []},
+                                       'form': {'trivial': False, 'applicable_rules': ['DR1', 'DR9']}})
+
+    splash = instance.analyze_screenshot_cascade('abi', screenshots[0], RULES, RULES_ANALYSIS)
+    form = instance.analyze_screenshot_cascade('abi', screenshots[1], RULES, RULES_ANALYSIS)
+
+    assert splash['triage']['escalated'] is False and splash['triage']['rules_skipped'] == 2
+    assert splash['violations'] == [] and 'model_metadata' not in splash
+    # Rule IDs triage made up are dropped; only the applicable rule reaches the full model
+    assert form['triage']['escalated'] is True and form['triage']['rules_escalated'] == ['DR1']
+    assert form['triage']['rules_skipped'] == 1
+    assert len(clients['full'].calls) == 1
+    assert "'DR1'" in clients['full'].calls[0]['prompt'] and "'DR2'" not in clients['full'].calls[0]['prompt']
+
+
+def test_triage_failure_escalates_with_every_rule(tmp_path, make_pipeline):
+    screenshot = make_screenshot(tmp_path / 'form.png', 'grey')
+    instance, clients = make_pipeline({'form': ValueError('not JSON')})
+
+    analysis = instance.analyze_screenshot_cascade('abi', screenshot, RULES, RULES_ANALYSIS)
+
+    assert analysis['triage']['escalated'] is True
+    assert analysis['triage']['rules_escalated'] == ['DR1', 'DR2']
+
+
+def test_summary_counts_only_calls_made_in_the_run(tmp_path, make_pipeline):
+    screenshots = [make_screenshot(tmp_path / 'splash.png', 'white'), make_screenshot(tmp_path / 'login.png', 'black'),
+                   make_screenshot(tmp_path / 'form.png', 'grey')]
+    replies = {'splash': {'trivial': True, 'applicable_rules': []},
+               'login': {'trivial': True, 'applicable_rules': []},
+               'form': {'trivial': False, 'applicable_rules': ['DR1']}}
+
+    first, _ = make_pipeline(replies)
+    assert run_cascade(first, screenshots) == {
+        'screenshots_triaged': 3,
+        'screenshots_escalated': 1,
+        'escalation_rate': 0.333,
+        'rule_escalation_rate': 0.167,
+        'triage_calls': 3,
+        'triage_latency_ms': 300,
+        'full_model_calls': 1,
+        'full_model_latency_ms': 2000,
+        # Two screens were not escalated, at this run's mean full-model latency each
+        'estimated_latency_saved_ms': 4000,
+        'cached_triage': 0,
+        'cached_analyses': 0
+    }
+
+    # A second run over the same screenshots is answered from the cache
+    second, clients = make_pipeline(replies)
+    summary = run_cascade(second, screenshots)
+    assert not clients['triage'].calls and not clients['full'].calls
+    assert summary['cached_triage'] == 3 and summary['cached_analyses'] == 1
+    assert summary['triage_calls'] == summary['full_model_calls'] == 0
+    assert summary['triage_latency_ms'] == summary['full_model_latency_ms'] == 0
+    # Nothing was measured, so there is no latency to estimate savings from
+    assert summary['estimated_latency_saved_ms'] is None
+
+
+def test_cached_analysis_points_at_the_current_upload(tmp_path, make_pipeline):
+    instance, clients = make_pipeline(cascade=False)
+    paths = []
+    for upload in ('first', 'second'):
+        os.makedirs(tmp_path / upload)
+        paths.append(make_screenshot(tmp_path / upload / 'form.png', 'grey'))
+
+    first = instance.analyze_screenshot('abi', paths[0], RULES_ANALYSIS)
+    second = instance.analyze_screenshot('abi', paths[1], RULES_ANALYSIS)
+
+    # Same image content: the second upload is answered from the cache...
+    assert len(clients['full'].calls) == 1
+    assert first['cached'] is False and second['cached'] is True
+    # ...but names its own file, not the first upload's
+    assert second['screenshot_path'] == paths[1]
+    assert second['screenshot_name'] == os.path.abspath(paths[1])
+    assert first['screenshot_path'] == paths[0]
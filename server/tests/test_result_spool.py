@@ -0,0 +1,36 @@
+import os
+import threading
+
+from ResultSpool import ResultSpool
+from StorageManager import is_leased
+
+
+def test_results_round_trip_in_order(tmp_path):
+    results = [{'screenshot': f'screen_{index}.png', 'violations': [{'rule_id': 'DR1', 'note': 'é\n'}]}
+               for index in range(5)]
+    with ResultSpool(str(tmp_path)) as spool:
+        for result in results:
+            spool.append(result)
+        assert len(spool) == 5
+        assert list(spool) == results
+        # A spool can be read more than once
+        assert list(spool) == results
+
+
+def test_index_restores_completion_order(tmp_path):
+    with ResultSpool(str(tmp_path)) as spool:
+        threads = [threading.Thread(target=spool.append, args=({'index': index}, index)) for index in range(20)]
+        for thread in reversed(threads):
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [result['index'] for result in spool] == list(range(20))
+
+
+def test_spool_is_leased_until_closed_then_deleted(tmp_path):
+    spool = ResultSpool(str(tmp_path))
+    spool.append({'screenshot': 'a.png'})
+    assert is_leased(spool.path)
+    spool.close()
+    assert not is_leased(spool.path)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+import rules_warmup
+from rules_warmup import RulesWarmer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def loader(tmp_path, monkeypatch):
+    """Stands in for the pipeline's rules analysis: fails `failures` times, then succeeds"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'ABI_rules.csv').write_text('Rule ID,Rule Name\nDR1,Labels\n')
+    clock = Clock()
+    monkeypatch.setattr(rules_warmup, 'time', clock)
+    state = {'failures': 0, 'calls': 0, 'evicted': 0, 'clock': clock}
+
+    class FakePipeline:
+        def __init__(self, budget=None):
+            self.cache_client = self
+
+        def read_decision_rules(self, csv_path, persona):
+            return [{'Rule ID': 'DR1'}]
+
+        def generate_rules_analysis(self, rules):
+            state['calls'] += 1
+            if state['calls'] <= state['failures']:
+                raise ValueError('model unavailable')
+            return [{'rule_id': 'DR1'}]
+
+        def validate_rules_analysis(self, rules, analysis):
+            pass
+
+        def rules_cache_key(self, rules):
+            return 'key'
+
+        def delete_cached_data(self, cache_key, subfolder):
+            state['evicted'] += 1
+
+    monkeypatch.setattr(rules_warmup, 'InclusivityPipeline', FakePipeline)
+    return state
+
+
+def test_backoff_doubles_up_to_the_maximum():
+    warmer = RulesWarmer('rules.csv', poll_interval=30, max_backoff=100)
+    assert [warmer.backoff(failures) for failures in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+
+def test_failed_persona_is_retried_with_backoff_until_ready(loader):
+    # Each warm-up attempt calls the model twice: once, then once more after evicting the cache
+    loader['failures'] = 4
+    warmer = RulesWarmer('rules.csv', poll_interval=30, max_backoff=3600)
+
+    warmer.check_for_changes()
+    report = warmer.report()
+    assert report['ready'] is False
+    assert report['personas']['ABI']['state'] == 'failed' and report['personas']['ABI']['failures'] == 1
+
+    # Not retried before the backoff elapses
+    loader['clock'].now += 29
+    warmer.check_for_changes()
+    assert loader['calls'] == 2
+
+    loader['clock'].now += 1
+    warmer.check_for_changes()
+    assert loader['calls'] == 4 and warmer.report()['personas']['ABI']['failures'] == 2
+
+    loader['clock'].now += 60
+    warmer.check_for_changes()
+    report = warmer.report()
+    assert report['ready'] is True and report['personas']['ABI']['state'] == 'ready'
+
+    # A ready persona is not warmed again until its rules file changes
+    warmer.check_for_changes()
+    assert loader['calls'] == 5
+
+
+def test_edited_rules_file_is_retried_at_once(loader, tmp_path):
+    loader['failures'] = 2
+    warmer = RulesWarmer('rules.csv', poll_interval=30)
+    warmer.check_for_changes()
+    assert warmer.report()['personas']['ABI']['state'] == 'failed'
+
+    os.utime(tmp_path / 'ABI_rules.csv', (0, 0))
+    warmer.check_for_changes()
+    assert warmer.report()['ready'] is True
+
+
+def test_health_is_unavailable_until_rules_are_warm(app_module, loader):
+    loader['failures'] = 2
+    warmer = RulesWarmer('rules.csv', poll_interval=30)
+    app_module.rules_warmer = warmer
+    client = app_module.app.test_client()
+
+    warmer.check_for_changes()
+    response = client.get('/api/health')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'warming'
+    assert response.get_json()['personas']['ABI']['error'] == 'model unavailable'
+
+    loader['clock'].now += 30
+    warmer.check_for_changes()
+    response = client.get('/api/health')
+    assert response.status_code == 200 and response.get_json()['status'] == 'ok'
@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import time
+
+from StorageManager import StorageArea, StorageManager as Manager, acquire_paths, release_paths, is_leased, lease_paths
+
+
+def write(path, size=10, age=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    if age:
+        os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+
+def test_leases_cover_nested_paths_and_count_holders(tmp_path):
+    session = str(tmp_path / 'session')
+    acquire_paths([session])
+    acquire_paths([session])
+    assert is_leased(os.path.join(session, 'resized', 'tile.png'))
+    release_paths([session])
+    assert is_leased(session)
+    release_paths([session])
+    assert not is_leased(session)
+
+
+def test_discard_removes_only_the_finished_session(tmp_path):
+    manager = Manager(areas=[])
+    first = str(tmp_path / 'analyses' / 'first')
+    second = str(tmp_path / 'analyses' / 'second')
+    write(os.path.join(first, 'a.png'))
+    write(os.path.join(second, 'a.png'))
+    acquire_paths([first])
+    acquire_paths([second])
+    try:
+        manager.discard([first])
+        assert not os.path.exists(first)
+        assert os.path.exists(os.path.join(second, 'a.png'))
+    finally:
+        release_paths([second])
+
+
+def test_discard_keeps_files_another_run_still_leases(tmp_path):
+    manager = Manager(areas=[])
+    shared = write(str(tmp_path / 'shared.png'))
+    acquire_paths([shared])  # this run
+    with lease_paths([shared]):  # a concurrent run
+        manager.discard([shared])
+        assert os.path.exists(shared)
+    assert not is_leased(shared)
+
+
+def test_sweep_evicts_old_unleased_files_only(tmp_path):
+    root = str(tmp_path / 'uploads')
+    area = StorageArea('test_uploads', root, quota_mb=0, max_age_hours=1)
+    manager = Manager(areas=[area], grace_period=60)
+    old = write(os.path.join(root, 'old.png'), age=7200)
+    leased = write(os.path.join(root, 'running', 'input.png'), age=7200)
+    recent = write(os.path.join(root, 'recent.png'))
+    with lease_paths([os.path.dirname(leased)]):
+        manager.sweep()
+    assert not os.path.exists(old)
+    assert os.path.exists(leased)
+    assert os.path.exists(recent)
+    assert manager.last_sweep['test_uploads']['evicted_files'] == 1
+
+
+def test_sweep_enforces_quota_oldest_first(tmp_path):
+    root = str(tmp_path / 'reports')
+    area = StorageArea('test_reports', root, quota_mb=0, max_age_hours=0)
+    area.quota_bytes = 25
+    manager = Manager(areas=[area], grace_period=0)
+    oldest = write(os.path.join(root, 'a.pdf'), age=300)
+    middle = write(os.path.join(root, 'b.pdf'), age=200)
+    newest = write(os.path.join(root, 'c.pdf'), age=100)
+    manager.sweep()
+    assert [os.path.exists(path) for path in (oldest, middle, newest)] == [False, True, True]
+
+
+def test_analysis_uses_and_deletes_only_its_own_uploads(app_module, monkeypatch):
+    from ResultSpool import ResultSpool
+    seen = {}
+
+    class FakePipeline:
+        def __init__(self, **kwargs):
+            self.run_metadata = {}
+            self.input_files = []
+
+        def run_pipeline_streaming(self, persona, rules_csv_path, screenshots_dir, output_path,
+                                   image_token_budget=None, session_id=None):
+            folder = os.path.join('images', screenshots_dir)
+            seen[session_id] = sorted(os.listdir(folder))
+            results = ResultSpool()
+            for name in seen[session_id]:
+                results.append({'screenshot': name})
+            return results
+
+    monkeypatch.setattr(app_module, 'InclusivityPipeline', FakePipeline)
+    # Saved by another user through /api/save-image, before their /api/analyze call
+    other_upload = write(os.path.join(app_module.UPLOAD_FOLDER, 'other-user.png'))
+    client = app_module.app.test_client()
+
+    def analyze(*names):
+        response = client.post('/api/analyze', content_type='multipart/form-data', data={
+            'persona': json.dumps({'name': 'ABI'}),
+            'images': [(io.BytesIO(b'png'), name) for name in names]
+        })
+        assert response.status_code == 200
+        return json.loads(response.get_data())
+
+    first = analyze('login.png', 'login.png')
+    second = analyze('checkout.png')
+
+    assert seen[first['report_id']] == ['login.png', 'login_1.png']
+    assert seen[second['report_id']] == ['checkout.png']
+    assert [result['screenshot'] for result in second['analysis_results']] == ['checkout.png']
+    assert os.path.exists(other_upload)
+    assert os.listdir(app_module.ANALYSIS_UPLOAD_FOLDER) == []
+
+
+def test_rejected_analysis_discards_its_uploads(app_module):
+    response = app_module.app.test_client().post('/api/analyze', content_type='multipart/form-data', data={
+        'images': [(io.BytesIO(b'png'), 'login.png')]
+    })
+    assert response.status_code == 400
+    assert os.listdir(app_module.ANALYSIS_UPLOAD_FOLDER) == []
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from TokenScheduler import TokenScheduler, RequestBudget, BudgetExceeded, INTERACTIVE, BATCH
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_waiting_calls_are_admitted_interactive_first_then_in_arrival_order():
+    scheduler = TokenScheduler(concurrency=1, tenant_token_limit=0)
+    admitted = []
+    blocker = threading.Event()
+
+    def call(name, priority):
+        with scheduler.admit(RequestBudget(priority=priority, token_limit=None), 10):
+            admitted.append(name)
+            if name == 'first':
+                blocker.wait()
+
+    threads = [threading.Thread(target=call, args=('first', BATCH))]
+    threads[0].start()
+    wait_for(lambda: admitted == ['first'])
+    for name, priority in (('batch-1', BATCH), ('interactive-1', INTERACTIVE), ('batch-2', BATCH),
+                           ('interactive-2', INTERACTIVE)):
+        thread = threading.Thread(target=call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: len(scheduler._waiting) == len(threads) - 1)
+    blocker.set()
+    for thread in threads:
+        thread.join()
+
+    assert admitted == ['first', 'interactive-1', 'interactive-2', 'batch-1', 'batch-2']
+
+
+def test_concurrency_limit_holds():
+    scheduler = TokenScheduler(concurrency=2, tenant_token_limit=0)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call():
+        with scheduler.admit(RequestBudget(token_limit=None), 1):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def test_request_budget_counts_reservations_and_reported_tokens():
+    scheduler = TokenScheduler(tenant_token_limit=0)
+    budget = RequestBudget(token_limit=1000)
+    with scheduler.admit(budget, 600):
+        assert budget.committed_tokens == 600
+        with pytest.raises(BudgetExceeded):
+            with scheduler.admit(budget, 500):
+                pass
+    scheduler.charge(budget, 500, 200, 0.01)
+    assert budget.committed_tokens == 700
+    with pytest.raises(BudgetExceeded):
+        with scheduler.admit(budget, 400):
+            pass
+    assert budget.report()['rejected_calls'] == 2
+    assert budget.report()['cost_usd'] == 0.01
+
+
+def test_tenant_budget_is_shared_across_requests_and_windowed():
+    scheduler = TokenScheduler(tenant_token_limit=1000, tenant_window=3600)
+    first, second, other = (RequestBudget(tenant='a', token_limit=None), RequestBudget(tenant='a', token_limit=None),
+                            RequestBudget(tenant='b', token_limit=None))
+    with scheduler.admit(first, 100):
+        pass
+    scheduler.charge(first, 700, 200, 0.0)
+    with pytest.raises(BudgetExceeded):
+        with scheduler.admit(second, 200):
+            pass
+    with scheduler.admit(other, 200):
+        pass
+    assert scheduler.tenant_exhausted('a') is False
+    scheduler.charge(second, 100, 0, 0.0)
+    assert scheduler.tenant_exhausted('a') is True
+    assert scheduler.tenant_usage()['a']['tokens'] == 1000
+
+    # Spend older than the window no longer counts
+    scheduler.tenant_window = 0
+    assert scheduler.tenant_exhausted('a') is False
+
+
+def test_output_limit_is_reserved_until_the_call_is_charged():
+    scheduler = TokenScheduler(tenant_token_limit=10_000)
+    first, second = RequestBudget(tenant='a', token_limit=None), RequestBudget(tenant='a', token_limit=None)
+    with scheduler.admit(first, 1000, max_output_tokens=8000):
+        assert first.committed_tokens == 9000
+        # A concurrent call could overrun the tenant window if its output were not reserved
+        with pytest.raises(BudgetExceeded):
+            with scheduler.admit(second, 1000, max_output_tokens=8000):
+                pass
+        scheduler.charge(first, 1000, 300, 0.0)
+    # The difference between the reservation and the reported tokens is freed
+    assert first.committed_tokens == 1300
+    assert first.report()['estimated_input_tokens'] == 1000
+    with scheduler.admit(second, 1000, max_output_tokens=7000):
+        pass
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from video_keyframes import extract_keyframes
+
+WIDTH, HEIGHT, FPS = 640, 360, 10
+
+
+def screen(title='Account settings', toast=False):
+    frame = np.full((HEIGHT, WIDTH, 3), 255, dtype=np.uint8)
+    cv2.rectangle(frame, (40, 40), (600, 80), (30, 90, 200), -1)
+    cv2.putText(frame, title, (50, 140), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    if toast:
+        # An error toast covering 1% of the frame
+        cv2.rectangle(frame, (288, 300), (351, 335), (40, 40, 200), -1)
+    return frame
+
+
+def write_video(path, screens, seconds=2):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), FPS, (WIDTH, HEIGHT))
+    for frame in screens:
+        for _ in range(seconds * FPS):
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    writer.release()
+
+
+def test_small_toast_is_a_keyframe_and_revisited_screens_are_not(tmp_path):
+    video = tmp_path / 'recording.avi'
+    write_video(video, [screen(), screen(toast=True), screen(), screen(title='Payment method'), screen()])
+
+    result = extract_keyframes(str(video), str(tmp_path / 'frames'))
+
+    timestamps = [keyframe['timestamp'] for keyframe in result['keyframes']]
+    assert len(timestamps) == 3
+    assert timestamps[0] < 2 <= timestamps[1] < 4 and 6 <= timestamps[2] < 8
+
+
+def test_static_recording_has_one_keyframe(tmp_path):
+    video = tmp_path / 'static.avi'
+    write_video(video, [screen()], seconds=3)
+
+    result = extract_keyframes(str(video), str(tmp_path / 'frames'))
+
+    assert len(result['keyframes']) == 1
+    assert result['frames_sampled'] == 6
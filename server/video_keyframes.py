@@ -0,0 +1,131 @@
+# video_keyframes.py
+import os
+import numpy as np
+from PIL import Image
+from typing import Dict, Any
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.webm', '.mkv', '.avi')
+
+# Frames per second sampled from a recording; UI states rarely last under half a second
+SAMPLE_FPS = float(os.environ.get('VIDEO_SAMPLE_FPS', 2))
+# Frames are compared block by block on a grayscale thumbnail, and the change between
+# two frames is the largest mean absolute difference (0-255) of any block. A toast or
+# inline error covering a single block (1/256 of the frame) is a change as much as a
+# full page load is; a whole-frame mean would dilute it below any useful threshold.
+THUMBNAIL_SIZE = (128, 128)
+BLOCK_GRID = 16
+# Block change that counts as a new screen
+SCENE_CHANGE_THRESHOLD = float(os.environ.get('VIDEO_SCENE_CHANGE_THRESHOLD', 24))
+# A changed frame is only kept once the next sample differs from it by less than this,
+# so transitions and animations do not produce half-drawn keyframes
+STABLE_THRESHOLD = 4.0
+# Keyframes whose 64-bit difference hashes are within this many bits are candidates for
+# the same screen, even if the recording returns to it later; they are only merged when
+# no block differs by more than SCENE_CHANGE_THRESHOLD either, since a small change such
+# as a toast leaves the coarse hash untouched
+DUPLICATE_HASH_DISTANCE = 2
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes):02d}:{seconds:04.1f}"
+
+
+def _thumbnail(frame: np.ndarray) -> np.ndarray:
+    return np.asarray(Image.fromarray(frame).convert('L').resize(THUMBNAIL_SIZE, Image.Resampling.BILINEAR), dtype=np.int16)
+
+
+def _change(thumb: np.ndarray, other: np.ndarray) -> float:
+    """Largest mean absolute difference of any block of two thumbnails"""
+    block = THUMBNAIL_SIZE[0] // BLOCK_GRID
+    difference = np.abs(thumb - other).reshape(BLOCK_GRID, block, BLOCK_GRID, block)
+    return float(difference.mean(axis=(1, 3)).max())
+
+
+def _difference_hash(frame: np.ndarray) -> int:
+    pixels = np.asarray(Image.fromarray(frame).convert('L').resize((9, 8), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def extract_keyframes(video_path: str, output_dir: str) -> Dict[str, Any]:
+    """
+    Decode a screen recording locally and keep one frame per distinct UI state.
+
+    Frames are sampled at SAMPLE_FPS. A frame becomes a keyframe when it differs
+    from the last keyframe by more than SCENE_CHANGE_THRESHOLD in any block of
+    the frame and has settled, and when no earlier keyframe of the recording
+    shows the same screen. Keyframes
+    are written as PNGs to output_dir.
+
+    Returns a dict with 'keyframes' (list of {'path', 'timestamp'}) and sampling stats.
+    """
+    try:
+        import cv2
+    except ImportError:
+        raise Exception("Video input requires opencv-python-headless (pip install opencv-python-headless)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise Exception(f"Could not open video {video_path}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, round(fps / SAMPLE_FPS))
+    keyframes, seen = [], []  # seen: (hash, thumbnail) of every keyframe
+    last_key_thumb = None
+    candidate = None  # (frame, thumbnail, timestamp) waiting to settle
+    frame_index, frames_sampled = 0, 0
+
+    def keep(frame: np.ndarray, thumb: np.ndarray, timestamp: float) -> None:
+        frame_hash = _difference_hash(frame)
+        if any(bin(frame_hash ^ seen_hash).count('1') <= DUPLICATE_HASH_DISTANCE
+               and _change(thumb, seen_thumb) <= SCENE_CHANGE_THRESHOLD for seen_hash, seen_thumb in seen):
+            return
+        seen.append((frame_hash, thumb))
+        path = os.path.join(output_dir, f"{stem}_{len(keyframes):04d}_{timestamp:08.2f}s.png")
+        Image.fromarray(frame).save(path)
+        keyframes.append({'path': path, 'timestamp': round(timestamp, 2)})
+
+    try:
+        while True:
+            # grab() skips frames without converting them to images
+            if not capture.grab():
+                break
+            if frame_index % step:
+                frame_index += 1
+                continue
+            ok, bgr = capture.retrieve()
+            if not ok:
+                break
+            frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            timestamp = frame_index / fps
+            thumb = _thumbnail(frame)
+            frames_sampled += 1
+            frame_index += 1
+
+            if candidate is not None:
+                if _change(thumb, candidate[1]) < STABLE_THRESHOLD:
+                    keep(*candidate)
+                    last_key_thumb = candidate[1]
+                    candidate = None
+                    continue
+                # Still changing: follow the transition until it settles
+                candidate = (frame, thumb, timestamp)
+                continue
+
+            if last_key_thumb is None or _change(thumb, last_key_thumb) > SCENE_CHANGE_THRESHOLD:
+                candidate = (frame, thumb, timestamp)
+
+        # A change in the very last sample never gets to settle; keep it anyway
+        if candidate is not None:
+            keep(*candidate)
+    finally:
+        capture.release()
+
+    return {
+        'keyframes': keyframes,
+        'duration': round(frame_index / fps, 2),
+        'frames_sampled': frames_sampled
+    }